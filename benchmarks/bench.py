@@ -0,0 +1,434 @@
+"""Benchmark msgpackio clients & servers
+
+Sweeps client types, transports, payload sizes, concurrency levels and pipelining
+depths, reports qps and latency percentiles and saves the results as JSON.
+
+.. code-block:: bash
+
+   python benchmarks/bench.py --clients compat socket async --transports tcp unix \\
+       --payloads 0 1024 65536 --concurrency 1 8 --depth 1 16 --output results.json
+
+The compression codecs are compared by sweeping the share of the payload that
+compresses, the bytes sent per request are reported along with the CPU time.
+
+.. code-block:: bash
+
+   python benchmarks/bench.py --clients compat async --codecs none zlib lz4 zstd \\
+       --compressibility 0 0.5 0.9 --payloads 65536 1048576
+
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import multiprocessing as mp
+import os
+import platform
+import sys
+import threading
+import time
+
+from msgpackio.aio import AsyncRPCClient
+from msgpackio.client import unix_path
+from msgpackio.compat import Client, Server
+from msgpackio.compression import CODECS, Compressor
+from msgpackio.ext import registry
+from msgpackio.server import Bindings, RPCServer
+
+
+class EchoServer(object):
+    def echo(self, value):
+        return value
+
+    def sum(self, x, y):
+        return x + y
+
+
+class ThreadServer:
+    """Server running in a thread of the benchmark process, it shares the GIL with the clients"""
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.address = None
+
+    def listen(self, host, port=None):
+        self.address = (host, port)
+
+    def start(self):
+        started = threading.Event()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, args=(started,), daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def _run(self, started):
+        loop = self.loop
+        asyncio.set_event_loop(loop)
+
+        bindings = Bindings(EchoServer(), dict())
+        host, port = self.address
+        path = unix_path(host)
+
+        if path is not None:
+            coro = loop.create_unix_server(lambda: RPCServer(bindings), path)
+        else:
+            coro = loop.create_server(lambda: RPCServer(bindings), host, port)
+
+        server = loop.run_until_complete(coro)
+        started.set()
+
+        loop.run_forever()
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        loop.close()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+        path = unix_path(self.address[0])
+        if path is not None and os.path.exists(path):
+            os.unlink(path)
+
+
+class LegacyServer:
+    """msgpackrpc server running in its own process, tcp only"""
+
+    def __init__(self):
+        self.process = None
+
+    def listen(self, host, port=None):
+        self.address = (host, port)
+
+    @staticmethod
+    def _run(host, port):
+        import msgpackrpc
+
+        server = msgpackrpc.Server(EchoServer())
+        server.listen(msgpackrpc.Address(host, port))
+        server.start()
+
+    def start(self):
+        self.process = mp.Process(target=self._run, args=self.address, daemon=True)
+        self.process.start()
+
+    def stop(self):
+        self.process.terminate()
+        self.process.join()
+
+
+def start_server(kind, address, workers):
+    if kind == "thread":
+        server = ThreadServer()
+    elif kind == "legacy":
+        server = LegacyServer()
+    else:
+        server = Server(EchoServer(), workers=workers)
+
+    server.listen(*address)
+    server.start()
+    return server
+
+
+def percentile(values, p):
+    """values must be sorted"""
+    if not values:
+        return 0
+
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+def compat_client(address, **kwargs):
+    return Client(*address, **kwargs)
+
+
+def socket_client(address):
+    from msgpackio.socket import SocketClient
+
+    client = SocketClient(*address)
+    client.connect(sleep_step=0.01)
+    return client
+
+
+def legacy_client(address):
+    import msgpackrpc
+
+    return msgpackrpc.Client(msgpackrpc.Address(*address))
+
+
+SYNC_CLIENTS = dict(compat=compat_client, socket=socket_client, legacy=legacy_client)
+
+
+def run_sync_worker(
+    factory, address, calls, depth, payload, barrier, latencies, options
+):
+    client = factory(address, **options)
+    batch = [("echo", (payload,))] * depth
+    barrier.wait()
+
+    for _ in range(calls // depth):
+        start = time.perf_counter()
+
+        if depth == 1:
+            client.call("echo", payload)
+        else:
+            client.call_many(batch)
+
+        latencies.append(time.perf_counter() - start)
+
+    barrier.wait()
+
+    if hasattr(client, "close"):
+        client.close()
+
+
+def run_sync(client, address, calls, concurrency, depth, payload, options):
+    factory = SYNC_CLIENTS[client]
+    barrier = threading.Barrier(concurrency + 1)
+    latencies = [[] for _ in range(concurrency)]
+
+    threads = [
+        threading.Thread(
+            target=run_sync_worker,
+            args=(
+                factory,
+                address,
+                calls // concurrency,
+                depth,
+                payload,
+                barrier,
+                lat,
+                options,
+            ),
+        )
+        for lat in latencies
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    barrier.wait()
+    wall, cpu = time.perf_counter(), time.process_time()
+    barrier.wait()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+    for thread in threads:
+        thread.join()
+
+    return wall, cpu, list(itertools.chain(*latencies))
+
+
+def run_async(client, address, calls, concurrency, depth, payload, options):
+    async def worker(client, n, latencies):
+        for _ in range(n // depth):
+            start = time.perf_counter()
+            await asyncio.gather(*[client.call("echo", payload) for _ in range(depth)])
+            latencies.append(time.perf_counter() - start)
+
+    async def main():
+        client = await AsyncRPCClient.connect(*address, **options)
+        latencies = []
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        await asyncio.gather(
+            *[
+                worker(client, calls // concurrency, latencies)
+                for _ in range(concurrency)
+            ]
+        )
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+        client.close()
+        return wall, cpu, latencies
+
+    return asyncio.run(main())
+
+
+def make_payload(size, compressibility):
+    """``compressibility`` is the share of the payload made of a repeated byte"""
+    noise = os.urandom(int(size * (1 - compressibility)))
+    return noise + b"x" * (size - len(noise))
+
+
+def wire_size(payload, codec, threshold):
+    """Size of an echo request once compressed"""
+    data = registry.packer().pack((0, 0, "echo", (payload,)))
+
+    if codec is None:
+        return len(data)
+
+    return len(Compressor(CODECS[codec], threshold).compress(data))
+
+
+def run(client, address, calls, concurrency, depth, payload, options=None):
+    options = options or dict()
+
+    if client == "async":
+        wall, cpu, latencies = run_async(
+            client, address, calls, concurrency, depth, payload, options
+        )
+    else:
+        wall, cpu, latencies = run_sync(
+            client, address, calls, concurrency, depth, payload, options
+        )
+
+    # a latency sample is the round trip of a whole pipelined batch
+    latencies.sort()
+    n = len(latencies) * depth
+
+    return dict(
+        calls=n,
+        qps=n / wall,
+        cpu_us_per_call=cpu * 1e6 / n,
+        p50_us=percentile(latencies, 0.50) * 1e6,
+        p99_us=percentile(latencies, 0.99) * 1e6,
+        p999_us=percentile(latencies, 0.999) * 1e6,
+    )
+
+
+def addresses(args):
+    yield "tcp", ("localhost", args.port)
+
+    if hasattr(__import__("socket"), "AF_UNIX"):
+        yield "unix", (f"unix:///tmp/msgpackio-bench-{os.getpid()}.sock", None)
+
+
+def supported(server, client, transport, depth, codec=None):
+    if server == "legacy" and transport != "tcp":
+        return False
+
+    if codec is not None and (client not in ("compat", "async") or server == "legacy"):
+        return False
+
+    if client == "legacy":
+        return transport == "tcp" and depth == 1
+
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--clients",
+        nargs="+",
+        default=["compat", "socket", "async"],
+        choices=["compat", "socket", "async", "legacy"],
+    )
+    parser.add_argument("--transports", nargs="+", default=["tcp", "unix"])
+    parser.add_argument("--payloads", nargs="+", type=int, default=[0, 1024, 65536])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--depth", nargs="+", type=int, default=[1, 16])
+    parser.add_argument("--calls", type=int, default=10000)
+    parser.add_argument(
+        "--codecs",
+        nargs="+",
+        default=["none"],
+        choices=["none"] + list(CODECS),
+        help="compression negotiated by the compat & async clients",
+    )
+    parser.add_argument(
+        "--compressibility",
+        nargs="+",
+        type=float,
+        default=[1],
+        help="share of the payload that compresses, the rest is random",
+    )
+    parser.add_argument("--threshold", type=int, default=1024)
+    parser.add_argument(
+        "--server",
+        default="process",
+        choices=["process", "thread", "legacy", "external"],
+        help="external expects a server already listening on --port",
+    )
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=18800)
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args(argv)
+
+    results = []
+    header = f"{'client':>7} {'transport':>9} {'payload':>8} {'conc':>4} {'depth':>5}"
+    header += f" {'codec':>5} {'compress':>8}"
+    metrics = f"{'qps':>10} {'p50 us':>9} {'p99 us':>9} {'p999 us':>9} {'cpu us':>7}"
+    metrics += f" {'wire KB':>8}"
+    print(header, metrics)
+
+    for transport, address in addresses(args):
+        if transport not in args.transports:
+            continue
+
+        if not supported(args.server, None, transport, 1):
+            continue
+
+        server = None
+        if args.server != "external":
+            server = start_server(args.server, address, args.workers)
+
+        try:
+            sweep = itertools.product(
+                args.clients,
+                args.payloads,
+                args.compressibility,
+                args.codecs,
+                args.concurrency,
+                args.depth,
+            )
+
+            for client, size, ratio, name, concurrency, depth in sweep:
+                codec = None if name == "none" else name
+                if not supported(args.server, client, transport, depth, codec):
+                    continue
+
+                options = dict()
+                if codec is not None:
+                    options = dict(
+                        compression=[codec], compression_threshold=args.threshold
+                    )
+
+                payload = make_payload(size, ratio)
+                result = run(
+                    client, address, args.calls, concurrency, depth, payload, options
+                )
+                result.update(
+                    client=client,
+                    transport=transport,
+                    payload=size,
+                    concurrency=concurrency,
+                    depth=depth,
+                    codec=name,
+                    compressibility=ratio,
+                    wire_bytes=wire_size(payload, codec, args.threshold),
+                )
+                results.append(result)
+
+                print(
+                    f"{client:>7} {transport:>9} {size:>8d} {concurrency:>4d} {depth:>5d}",
+                    f"{name:>5} {ratio:8.2f}",
+                    f"{result['qps']:10.1f} {result['p50_us']:9.1f} {result['p99_us']:9.1f}",
+                    f"{result['p999_us']:9.1f} {result['cpu_us_per_call']:7.1f}",
+                    f"{result['wire_bytes'] / 1024:8.1f}",
+                )
+        finally:
+            if server is not None:
+                server.stop()
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(
+                dict(
+                    date=datetime.datetime.now().isoformat(),
+                    python=sys.version,
+                    platform=platform.platform(),
+                    server=args.server,
+                    workers=args.workers,
+                    results=results,
+                ),
+                file,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Measure the per message overhead of packing, unpacking and dispatching"""
+
+import timeit
+
+import msgpack
+
+from msgpackio.ext import registry
+from msgpackio.rpc import REQUEST, RESPONSE
+from msgpackio.server import Bindings, RPCServer
+
+Num = 100000
+Batch = 100
+
+
+class SumServer(object):
+    def sum(self, x, y):
+        return x + y
+
+
+class Transport:
+    def is_closing(self):
+        return False
+
+    def writelines(self, data):
+        pass
+
+
+class LegacyBindings:
+    """Attribute lookup done on every call"""
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def get(self, item, default=None):
+        if isinstance(item, bytes):
+            item = item.decode("utf-8")
+
+        if hasattr(self.obj, item):
+            return getattr(self.obj, item)
+
+        return default
+
+
+def report(name, seconds, n):
+    print(f"{name:>35}: {seconds * 1e9 / n:8.1f} ns/message")
+
+
+def timeit_min(fun, number):
+    """Best of 5 runs, the machine noise only makes things slower"""
+    return min(timeit.repeat(fun, number=number, repeat=5))
+
+
+def bench_lookup():
+    legacy = LegacyBindings(SumServer())
+    bindings = Bindings(SumServer(), dict())
+
+    for name, method in [("str", "sum"), ("bytes", b"sum")]:
+        seconds = timeit_min(lambda: legacy.get(method), number=Num)
+        report(f"legacy lookup ({name})", seconds, Num)
+
+        seconds = timeit_min(lambda: bindings.handler(method), number=Num)
+        report(f"table lookup ({name})", seconds, Num)
+
+
+def bench_pack():
+    packer = registry.packer()
+
+    seconds = timeit_min(lambda: packer.pack([REQUEST, 1, "sum", (1, 2)]), number=Num)
+    report("pack request (list)", seconds, Num)
+
+    seconds = timeit_min(lambda: packer.pack((REQUEST, 1, "sum", (1, 2))), number=Num)
+    report("pack request (tuple)", seconds, Num)
+
+    seconds = timeit_min(lambda: packer.pack((RESPONSE, 1, None, 3)), number=Num)
+    report("pack response", seconds, Num)
+
+
+def bench_unpack():
+    data = msgpack.packb([REQUEST, 1, "sum", [1, 2]]) * Batch
+
+    for use_list in [True, False]:
+        unpacker = registry.unpacker(use_list=use_list)
+
+        def unpack():
+            unpacker.feed(data)
+            for _ in unpacker:
+                pass
+
+        seconds = timeit_min(unpack, number=Num // Batch)
+        report(f"unpack request (use_list={use_list})", seconds, Num)
+
+
+def bench_dispatch():
+    server = RPCServer(Bindings(SumServer(), dict()))
+    server.connection_made(Transport())
+    server.batching = True
+
+    msg = [REQUEST, 1, "sum", [1, 2]]
+
+    def dispatch():
+        server.on_message(msg)
+        server.wbuffer = []
+        server.wsize = 0
+
+    seconds = timeit_min(dispatch, number=Num)
+    report("dispatch + pack response", seconds, Num)
+
+
+def bench_request():
+    data = b"".join(msgpack.packb([REQUEST, i, "sum", [1, 2]]) for i in range(Batch))
+
+    for metrics in [True, False]:
+        server = RPCServer(Bindings(SumServer(), dict()), metrics=metrics)
+        server.connection_made(Transport())
+
+        seconds = timeit_min(lambda: server.data_received(data), number=Num // Batch)
+        report(f"unpack + dispatch + pack (metrics={metrics})", seconds, Num)
+
+
+if __name__ == "__main__":
+    bench_lookup()
+    bench_pack()
+    bench_unpack()
+    bench_dispatch()
+    bench_request()
@@ -0,0 +1,45 @@
+"""Measure the throughput of large responses, from 1 KB to 100 MB"""
+import time
+
+from msgpackio.compat import Client, Server
+
+Sizes = [2 ** 10, 2 ** 14, 2 ** 17, 2 ** 20, 10 * 2 ** 20, 100 * 2 ** 20]
+Total = 200 * 2 ** 20
+
+
+class PayloadServer(object):
+    def __init__(self):
+        self.payloads = dict()
+
+    def payload(self, size):
+        if size not in self.payloads:
+            self.payloads[size] = b"x" * size
+
+        return self.payloads[size]
+
+
+def run(client, size):
+    n = max(Total // size, 10)
+    client.call("payload", size)
+
+    before = time.perf_counter()
+    for x in range(n):
+        assert len(client.call("payload", size)) == size
+
+    diff = time.perf_counter() - before
+    mb = n * size / 2 ** 20
+    print(f"{size:>10d} B: {n / diff:10.2f} calls/s {mb / diff:10.2f} MB/s")
+
+
+if __name__ == "__main__":
+    server = Server(PayloadServer())
+    server.listen("localhost", 18802)
+    server.start()
+
+    client = Client("localhost", 18802)
+
+    for size in Sizes:
+        run(client, size)
+
+    client.close()
+    server.stop()
@@ -0,0 +1,52 @@
+"""Measure how the server qps scales with the number of worker processes"""
+import multiprocessing as mp
+import os
+import time
+
+from msgpackio.compat import Client, Server
+
+Num = 10000
+Clients = 8
+
+
+class SumServer(object):
+    def sum(self, x, y):
+        return x + y
+
+
+def run_client(port, barrier):
+    client = Client("localhost", port)
+    barrier.wait()
+
+    for x in range(Num):
+        assert client.call("sum", 1, 2) == 3
+
+    client.close()
+
+
+def run(workers, port=18801):
+    server = Server(SumServer(), workers=workers)
+    server.listen("localhost", port)
+    server.start()
+
+    barrier = mp.Barrier(Clients + 1)
+    clients = [mp.Process(target=run_client, args=(port, barrier)) for _ in range(Clients)]
+
+    for c in clients:
+        c.start()
+
+    barrier.wait()
+    before = time.time()
+
+    for c in clients:
+        c.join()
+
+    diff = time.time() - before
+    server.stop()
+
+    print(f"workers={workers:2d} clients={Clients}: {Num * Clients / diff:.4f} qps")
+
+
+if __name__ == "__main__":
+    for workers in sorted(set([1, 2, 4, os.cpu_count()])):
+        run(workers)
@@ -0,0 +1,441 @@
+import asyncio
+import logging
+import time
+
+from msgpackio.client import unix_path
+from msgpackio.compression import (
+    CODECS,
+    FUNCNAME_NEGOTIATE,
+    Compressed,
+    Compressor,
+    Decompressor,
+    available,
+    negotiate,
+)
+from msgpackio.exceptions import NoMethod, RemoteException
+from msgpackio.ext import registry
+from msgpackio.rpc import CHUNK, CREDIT, NOTIFY, REQUEST, RESPONSE, LostFuture, _seq
+from msgpackio.stream import AsyncStream
+
+log = logging.getLogger(__name__)
+
+
+class AsyncRPCClient(asyncio.Protocol):
+    """asyncio client, every call returns an ``asyncio.Future`` resolved by msgid
+
+    Examples
+    --------
+
+    .. code-block:: python
+
+       client = await AsyncRPCClient.connect("localhost", 18800)
+       result = await client.call("sum", 1, 2)  # = > 3
+
+    Parameters
+    ----------
+    compression: bool or List[str]
+        Codecs proposed to the server when connecting, see :class:`~msgpackio.rpc.RPCClient`
+
+    bindings: object
+        Object whose public methods, functions or coroutines, the server can call or notify
+
+    Notes
+    -----
+    With a tracer, see :mod:`msgpackio.tracing`, the wakeup phase ends once the
+    callbacks of the future, including the awaiting task, have run.
+
+    """
+
+    FUNCNAME_SUBSCRIBE = "__subscribe__"
+    FUNCNAME_UNSUBSCRIBE = "__unsubscribe__"
+    FUNCNAME_PUBLISH = "__publish__"
+    FUNCNAME_MESSAGE = "__message__"
+
+    def __init__(
+        self, tracer=None, compression=None, compression_threshold=65536, bindings=None
+    ):
+        self.unpacker = registry.unpacker()
+        self.packer = registry.packer()
+        self.generator = _seq()
+        self.bindings = bindings
+        # requests of the server being run
+        self.tasks = set()
+        # topic => callbacks receiving its messages
+        self._topics = dict()
+        self.transport = None
+        self._pending_results = dict()
+        # msgid => AsyncStream of the streamed responses
+        self._streams = dict()
+
+        self.tracer = tracer
+        # msgid => time.monotonic() at which the request was written
+        self._sent_at = dict()
+        self._read_at = None
+
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        self.compressor = None
+        # compressed messages are rejected until codecs are proposed
+        self.decompressor = None
+        self.codec = None
+
+    @classmethod
+    async def connect(cls, host, port=None, retries=20, sleep_time=0.01, **kwargs):
+        """Connect to ``host:port`` or to ``unix:///path/to/socket``"""
+        loop = asyncio.get_running_loop()
+        path = unix_path(host)
+        pending = None
+
+        for i in range(retries):
+            try:
+                if path is not None:
+                    _, protocol = await loop.create_unix_connection(
+                        lambda: cls(**kwargs), path
+                    )
+                else:
+                    _, protocol = await loop.create_connection(
+                        lambda: cls(**kwargs), host, port
+                    )
+                log.debug(f"Connection established after {i} retries")
+                break
+
+            except (ConnectionRefusedError, FileNotFoundError) as err:
+                pending = err
+                await asyncio.sleep(sleep_time)
+
+        else:
+            log.debug("Could not establish connection")
+            raise pending
+
+        if protocol.compression:
+            await protocol.negotiate_compression(
+                protocol.compression, protocol.compression_threshold
+            )
+
+        return protocol
+
+    async def negotiate_compression(self, codecs=True, threshold=65536):
+        """Agree on a codec with the server, returns its name or None"""
+        if codecs is True:
+            codecs = available()
+
+        # the server can compress its responses as soon as it picks a codec
+        self.decompressor = Decompressor([CODECS[n] for n in codecs if n in CODECS])
+
+        try:
+            name = await self.call(FUNCNAME_NEGOTIATE, list(codecs), threshold)
+        except RemoteException:
+            # the server does not support compression
+            name = None
+
+        codec = None
+        if name is not None:
+            codec = negotiate([name])
+
+        self.compressor = None
+        self.decompressor = None
+        if codec is not None:
+            self.compressor = Compressor(codec, threshold)
+            self.decompressor = Decompressor([codec])
+
+        self.codec = name
+        return name
+
+    def connection_made(self, transport):
+        log.debug("Client: A connection was made")
+        self.transport = transport
+
+    def data_received(self, data):
+        if self.tracer is not None:
+            self._read_at = time.monotonic()
+
+        self.unpacker.feed(data)
+
+        for message in self.unpacker:
+            if message.__class__ is Compressed:
+                message = self.decompress(message)
+
+                if message is None:
+                    return
+
+            self.on_message(message)
+
+    def decompress(self, compressed):
+        """Returns the decompressed message, or None after closing the connection
+        if no codec was negotiated or the message is too large"""
+        try:
+            if self.decompressor is None:
+                raise ValueError("no codec was negotiated")
+
+            return self.decompressor.decompress(compressed)
+
+        except ValueError as err:
+            log.error("Client: Rejected a compressed message, %s", err)
+            self.transport.abort()
+            return None
+
+    def connection_lost(self, exc):
+        log.debug("Client: The connection was lost")
+        pending = self._pending_results
+        self._pending_results = dict()
+        self._sent_at = dict()
+
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(LostFuture("Connection lost"))
+
+        streams = self._streams
+        self._streams = dict()
+
+        for stream in streams.values():
+            stream.end()
+
+    def on_message(self, msg):
+        if msg[0] != RESPONSE:
+            return self.on_peer_message(msg)
+
+        _, msgid, error, result = msg
+        future = self._pending_results.pop(msgid, None)
+
+        if future is None:
+            # the request expired or the connection was reset
+            log.debug(f"Discarding the response of an unknown request")
+            return
+
+        if self.tracer is not None:
+            self._trace_response(msgid, future)
+
+        # the caller might have cancelled it
+        if future.done():
+            return
+
+        if error is not None:
+            future.set_exception(RemoteException.from_msgpack(error))
+        else:
+            future.set_result(result)
+
+        if self._streams:
+            stream = self._streams.pop(msgid, None)
+            if stream is not None:
+                stream.end()
+
+    def on_peer_message(self, msg):
+        """Handle the messages of the server that are not responses"""
+        if msg[0] == CHUNK:
+            stream = self._streams.get(msg[1])
+            if stream is not None:
+                stream.put(msg[2])
+
+        elif msg[0] == REQUEST and len(msg) == 4:
+            task = asyncio.ensure_future(self.run_request(msg[1], msg[2], msg[3]))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+        elif msg[0] == NOTIFY and msg[1] == AsyncRPCClient.FUNCNAME_MESSAGE:
+            self._on_published(*msg[2])
+
+        elif msg[0] == NOTIFY and len(msg) == 3:
+            task = asyncio.ensure_future(self.run_notify(msg[1], msg[2]))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+        else:
+            log.error("%s is not supported for client", msg[0])
+
+    def _binding(self, method):
+        """Returns the function of the bindings named ``method`` or None"""
+        if self.bindings is None or not isinstance(method, str):
+            return None
+
+        if method.startswith("_"):
+            return None
+
+        function = getattr(self.bindings, method, None)
+        if not callable(function):
+            return None
+
+        return function
+
+    async def run_request(self, msgid, method, params):
+        function = self._binding(method)
+        result = None
+        error = None
+
+        try:
+            if function is None:
+                raise NoMethod(f"`{method}` is not available")
+
+            result = function(*params)
+            if asyncio.iscoroutine(result):
+                result = await result
+
+        except NoMethod as err:
+            error = err
+        except Exception as err:
+            error = RemoteException(f"{type(err).__name__}: {err}")
+
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.write(self._pack((RESPONSE, msgid, error, result)))
+
+    async def run_notify(self, method, params):
+        function = self._binding(method)
+
+        if function is None:
+            log.debug("Discarding the notification %s", method)
+            return
+
+        try:
+            result = function(*params)
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception:
+            log.exception("Notification %s failed", method)
+
+    def subscribe(self, topic, callback):
+        """Call ``callback(message)``, a function or coroutine, with the messages
+        published on ``topic``"""
+        self._topics.setdefault(topic, []).append(callback)
+        return self.call(AsyncRPCClient.FUNCNAME_SUBSCRIBE, topic)
+
+    def unsubscribe(self, topic):
+        self._topics.pop(topic, None)
+        return self.call(AsyncRPCClient.FUNCNAME_UNSUBSCRIBE, topic)
+
+    def publish(self, topic, message):
+        """Publish ``message`` on ``topic``, resolves to the number of subscribers"""
+        return self.call(AsyncRPCClient.FUNCNAME_PUBLISH, topic, message)
+
+    def _on_published(self, topic, message):
+        for callback in self._topics.get(topic, ()):
+            try:
+                result = callback(message)
+            except Exception:
+                log.exception("Subscriber of %s failed", topic)
+                continue
+
+            if asyncio.iscoroutine(result):
+                task = asyncio.ensure_future(result)
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+    def _trace_response(self, msgid, future):
+        tracer = self.tracer
+        decoded_at = time.monotonic()
+
+        tracer.on_phase("wait", msgid, self._sent_at.pop(msgid, None), self._read_at)
+        tracer.on_phase("unpack", msgid, self._read_at, decoded_at)
+
+        if future.done():
+            return
+
+        future.add_done_callback(
+            lambda _: tracer.on_phase("wakeup", msgid, decoded_at, time.monotonic())
+        )
+
+    def call(self, method, *args, timeout=None):
+        """Send a request, returns a future that resolves to its result
+
+        The timeout is sent with the request, when it expires the server drops
+        the request and the future raises ``TimeoutError``
+        """
+        loop = asyncio.get_running_loop()
+        msgid = next(self.generator)
+        future = loop.create_future()
+
+        if self.transport is None or self.transport.is_closing():
+            future.set_exception(LostFuture("Connection lost"))
+            return future
+
+        self._pending_results[msgid] = future
+
+        if timeout is None:
+            msg = (REQUEST, msgid, method, args)
+        else:
+            msg = (REQUEST, msgid, method, args, timeout)
+            handle = loop.call_later(timeout, self._expire, msgid)
+            future.add_done_callback(lambda _: handle.cancel())
+
+        if self.tracer is not None:
+            self._send_traced(msgid, msg)
+        elif self.compressor is None:
+            self.transport.write(self.packer.pack(msg))
+        else:
+            self.transport.write(self._pack(msg))
+
+        return future
+
+    def _pack(self, msg):
+        data = self.packer.pack(msg)
+
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+
+        return data
+
+    def _send_traced(self, msgid, msg):
+        start = time.monotonic()
+        data = self._pack(msg)
+        packed = time.monotonic()
+        self.transport.write(data)
+        self._sent_at[msgid] = sent_at = time.monotonic()
+
+        self.tracer.on_phase("pack", msgid, start, packed)
+        self.tracer.on_phase("send", msgid, packed, sent_at)
+
+    def _expire(self, msgid):
+        future = self._pending_results.pop(msgid, None)
+        self._sent_at.pop(msgid, None)
+
+        if future is not None and not future.done():
+            future.set_exception(asyncio.TimeoutError("Deadline exceeded"))
+
+    def stream(self, method, *args, window=16):
+        """Call a generator binding, returns an async iterator over the items it yields
+
+        Examples
+        --------
+
+        .. code-block:: python
+
+           async with client.stream("rows", "SELECT * FROM table") as rows:
+               async for row in rows:
+                   print(row)
+
+        """
+        loop = asyncio.get_running_loop()
+        msgid = next(self.generator)
+        future = loop.create_future()
+        stream = AsyncStream(self, future, msgid, window)
+
+        if self.transport is None or self.transport.is_closing():
+            future.set_exception(LostFuture("Connection lost"))
+            stream.end()
+            return stream
+
+        self._pending_results[msgid] = future
+        self._streams[msgid] = stream
+
+        # the window is sent along with the request, after the timeout
+        self.transport.write(self._pack((REQUEST, msgid, method, args, None, window)))
+
+        return stream
+
+    def _grant(self, msgid, n):
+        """Allow the server to send ``n`` more chunks, cancel the stream if negative"""
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.write(self.packer.pack((CREDIT, msgid, n)))
+
+    def notify(self, method, *args):
+        """Send a notification, the server does not reply"""
+        self.transport.write(self._pack((NOTIFY, method, args)))
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, a, b, c):
+        self.close()
+        return
@@ -0,0 +1,308 @@
+"""Caches of the responses of the bindings marked with ``binding(cache=...)``
+
+The server keys the cache on the packed method & params of the request, as they
+were received, and stores the packed result: a hit neither decodes the params
+into a key nor runs the binding nor packs the result.
+
+Each server process keeps its own caches.
+
+Clients created with ``cache=True`` also cache the results of these methods,
+the server notifies them when the results are invalidated, see :class:`ClientCache`.
+
+Examples
+--------
+
+.. code-block:: python
+
+   class Bindings:
+       @binding(cache=1024, ttl=60)
+       def lookup(self, key):
+           return database[key]
+
+   client.call("__invalidate__", "lookup")
+
+"""
+
+import threading
+from collections import OrderedDict
+
+from msgpackio.ext import registry
+
+# built-in method of the server, returns ``{method: ttl}`` of the cached bindings
+FUNCNAME_CACHEABLE = "__cacheable__"
+# built-in method of the server & notification sent to the clients, ``[method]``
+FUNCNAME_INVALIDATE = "__invalidate__"
+
+
+class ResponseCache:
+    """LRU cache of packed results, the oldest entries are evicted once ``size`` is reached
+
+    Parameters
+    ----------
+    size: int
+        Maximum number of entries
+
+    ttl: float
+        Seconds after which an entry expires, entries never expire if None
+
+    """
+
+    def __init__(self, size, ttl=None):
+        self.size = size
+        self.ttl = ttl
+        # key => (expires, packed result)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, now):
+        """Returns the packed result of ``key`` or None"""
+        entry = self.entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires, body = entry
+        if expires is not None and now >= expires:
+            del self.entries[key]
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key, body, now):
+        expires = None
+        if self.ttl is not None:
+            expires = now + self.ttl
+
+        self.entries[key] = (expires, body)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self):
+        """Drop all the entries, returns their number"""
+        n = len(self.entries)
+        self.entries.clear()
+        return n
+
+    def stats(self):
+        lookups = self.hits + self.misses
+
+        return dict(
+            entries=len(self.entries),
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            hit_ratio=self.hits / lookups if lookups else 0,
+            bytes=sum(len(body) for _, body in self.entries.values()),
+        )
+
+
+# tag => size of the objects whose size does not depend on their content
+_FIXED = {
+    0xC0: 1,
+    0xC2: 1,
+    0xC3: 1,
+    0xCA: 5,
+    0xCB: 9,
+    0xCC: 2,
+    0xCD: 3,
+    0xCE: 5,
+    0xCF: 9,
+    0xD0: 2,
+    0xD1: 3,
+    0xD2: 5,
+    0xD3: 9,
+    0xD4: 3,
+    0xD5: 4,
+    0xD6: 6,
+    0xD7: 10,
+    0xD8: 18,
+}
+# tag => (width of the length, size of the header) of bin, ext & str
+_SIZED = {
+    0xC4: (1, 2),
+    0xC5: (2, 3),
+    0xC6: (4, 5),
+    0xC7: (1, 3),
+    0xC8: (2, 4),
+    0xC9: (4, 6),
+    0xD9: (1, 2),
+    0xDA: (2, 3),
+    0xDB: (4, 5),
+}
+# tag => (width of the count, objects per count) of arrays & maps
+_CONTAINERS = {0xDC: (2, 1), 0xDD: (4, 1), 0xDE: (2, 2), 0xDF: (4, 2)}
+
+
+def _skip(data, pos):
+    """Returns the position following the packed object at ``pos``"""
+    remaining = 1
+
+    while remaining:
+        remaining -= 1
+        tag = data[pos]
+
+        if tag <= 0x7F or tag >= 0xE0:
+            pos += 1
+        elif tag <= 0x8F:
+            remaining += 2 * (tag & 0x0F)
+            pos += 1
+        elif tag <= 0x9F:
+            remaining += tag & 0x0F
+            pos += 1
+        elif tag <= 0xBF:
+            pos += 1 + (tag & 0x1F)
+        elif tag in _FIXED:
+            pos += _FIXED[tag]
+        elif tag in _SIZED:
+            width, header = _SIZED[tag]
+            pos += header + int.from_bytes(data[pos + 1 : pos + 1 + width], "big")
+        else:
+            width, per_count = _CONTAINERS[tag]
+            remaining += per_count * int.from_bytes(
+                data[pos + 1 : pos + 1 + width], "big"
+            )
+            pos += 1 + width
+
+    return pos
+
+
+def request_key(data, start, end):
+    """Returns the packed method & params of the request ``data[start:end]``
+
+    The msgid, which changes for every request, and the timeout are skipped.
+    Returns None if ``data`` does not hold the request.
+    """
+    if start < 0 or end - start < 4:
+        return None
+
+    # [array header][REQUEST][msgid][method][params]([timeout])
+    header = data[start]
+    if (header != 0x94 and header != 0x95) or data[start + 1] != 0:
+        return None
+
+    tag = data[start + 2]
+    if tag <= 0x7F:
+        pos = start + 3
+    elif 0xCC <= tag <= 0xCF:
+        pos = start + 3 + (1 << (tag - 0xCC))
+    else:
+        return None
+
+    if header == 0x95:
+        end = _skip(data, _skip(data, pos))
+
+    return data[pos:end]
+
+
+def call_key(method, args):
+    """Key of a call in :class:`ClientCache`, it starts with the packed method"""
+    return registry.packb(method) + registry.packb(args)
+
+
+class ClientCache:
+    """Results of the cacheable methods kept by a client, see :class:`~msgpackio.rpc.RPCClient`
+
+    Parameters
+    ----------
+    methods: Dict[str, float]
+        TTL in seconds of the result of each cacheable method, None never expires
+
+    size: int
+        Maximum number of entries
+
+    Notes
+    -----
+    The results are shared by the callers, they must not be modified.
+
+    The entries are dropped when the server notifies an invalidation; results
+    requested before it are not cached.
+
+    """
+
+    def __init__(self, methods, size):
+        self.methods = methods
+        self.size = size
+        self.lock = threading.Lock()
+        # key => (expires, result)
+        self.entries = OrderedDict()
+        # key => concurrent.futures.Future of the call in flight
+        self.pending = dict()
+        # incremented by every invalidation
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.collapsed = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, now):
+        """Returns ``(True, result)`` or ``(False, None)`` on a miss, the lock must be held"""
+        entry = self.entries.get(key)
+
+        if entry is not None:
+            expires, result = entry
+
+            if expires is None or now < expires:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, result
+
+            del self.entries[key]
+
+        self.misses += 1
+        return False, None
+
+    def put(self, key, method, result, epoch, now):
+        """Cache ``result`` unless an invalidation happened since ``epoch``"""
+        ttl = self.methods.get(method)
+        expires = None
+        if ttl is not None:
+            expires = now + ttl
+
+        with self.lock:
+            if epoch != self.epoch:
+                return
+
+            self.entries[key] = (expires, result)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, method=None):
+        """Drop the entries of ``method`` or all of them if None"""
+        with self.lock:
+            self.epoch += 1
+            self.invalidations += 1
+
+            if method is None:
+                self.entries.clear()
+                return
+
+            prefix = registry.packb(method)
+            for key in [k for k in self.entries if k.startswith(prefix)]:
+                del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+
+            return dict(
+                entries=len(self.entries),
+                hits=self.hits,
+                misses=self.misses,
+                collapsed=self.collapsed,
+                evictions=self.evictions,
+                invalidations=self.invalidations,
+                hit_ratio=self.hits / lookups if lookups else 0,
+            )
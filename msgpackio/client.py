@@ -5,7 +5,9 @@ import time
 import queue
 import multiprocessing as mp
 import traceback
-import msgpack
+
+from msgpackio.compression import MAX_SIZE, Compressed, Compressor, Decompressor
+from msgpackio.ext import registry
 
 log = logging.getLogger(__name__)
 
@@ -22,20 +24,111 @@ except ImportError:
         return bytearray(size)
 
 
-class Client:
-    """Connect to a server, send & receive message encoded using msgpack"""
+UNIX_SCHEME = "unix://"
+
+
+def unix_path(host):
+    """Returns the socket path of a ``unix:///path`` address, None for TCP addresses"""
+    if isinstance(host, str) and host.startswith(UNIX_SCHEME):
+        return host[len(UNIX_SCHEME) :]
+
+    return None
+
+
+# msgpack encoding of the header of ``[RESPONSE, msgid, None, bin]``
+_RESPONSE_HEADER = (0x94, 0x01)
+_UINT_SIZES = {0xCC: 1, 0xCD: 2, 0xCE: 4, 0xCF: 8}
+_BIN_SIZES = {0xC4: 1, 0xC5: 2, 0xC6: 4}
+
+
+def _bin_response_header(view):
+    """Parse the header of a response whose result is a ``bin``
+
+    Returns
+    -------
+    ``(msgid, header size, payload size)`` or None if ``view`` does not start
+    with such a response
+    """
+    n = len(view)
+    if n < 4 or (view[0], view[1]) != _RESPONSE_HEADER:
+        return None
+
+    tag = view[2]
+    if tag <= 0x7F:
+        msgid, pos = tag, 3
+    elif tag in _UINT_SIZES:
+        pos = 3 + _UINT_SIZES[tag]
+        msgid = int.from_bytes(view[3:pos], "big")
+    else:
+        return None
+
+    # error must be nil
+    if n < pos + 2 or view[pos] != 0xC0 or view[pos + 1] not in _BIN_SIZES:
+        return None
 
-    def __init__(self, host, port, wqueue=None, rqueue=None, state=None):
+    start = pos + 2
+    end = start + _BIN_SIZES[view[pos + 1]]
+    if n < end:
+        return None
+
+    return msgid, end, int.from_bytes(view[start:end], "big")
+
+
+class Client:
+    """Connect to a server, send & receive message encoded using msgpack
+
+    Parameters
+    ----------
+    host: str
+        Hostname or ``unix:///path/to/socket`` to connect through a unix domain socket
+
+    zero_copy_threshold: int
+        Responses whose result is a ``bin`` larger than this are received directly
+        into their own buffer and returned as a ``memoryview``, up to ``MAX_SIZE``
+
+    max_buffer_size: int
+        The read buffer grows up to this size while receiving large messages
+
+    """
+
+    def __init__(
+        self,
+        host,
+        port=None,
+        wqueue=None,
+        rqueue=None,
+        state=None,
+        zero_copy_threshold=65536,
+        max_buffer_size=1 << 20,
+    ):
         self.host = host
         self.port = port
 
         self.sock = None
         self.buffer = byte_buffer(8192)
+        self.view = memoryview(self.buffer)
+        self.zero_copy_threshold = zero_copy_threshold
+        self.max_buffer_size = max_buffer_size
 
-        self.packer = msgpack.Packer(default=lambda x: x.to_msgpack())
-        self.unpacker = msgpack.Unpacker()
+        self.packer = registry.packer()
+        self.unpacker = registry.unpacker()
         self.pending = []
 
+        # compresses the large messages once a codec is negotiated
+        self.compressor = None
+        # compressed messages are rejected until codecs are proposed
+        self.decompressor = None
+
+        # messages received without going through the unpacker
+        self.received = []
+        # bytes fed to the unpacker & offset of the end of the last message decoded
+        self.fed = 0
+        self.boundary = 0
+
+        # record the time.monotonic() of the last read, used by tracers
+        self.trace_reads = False
+        self.read_at = None
+
         # For Async
         self.state = state
         self.wqueue = wqueue
@@ -43,6 +136,12 @@ class Client:
 
     def close(self):
         if self.sock:
+            try:
+                # wake up any thread blocked in recv
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
             self.sock.close()
 
     def __enter__(self):
@@ -67,14 +166,20 @@ class Client:
         pending = None
         s = None
 
+        path = unix_path(self.host)
+        if path is not None:
+            family, address = socket.AF_UNIX, path
+        else:
+            family, address = socket.AF_INET, (self.host, self.port)
+
         for i in range(retries):
             if s is not None:
                 s.close()
 
             try:
-                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                s = socket.socket(family, socket.SOCK_STREAM)
                 s.setblocking(True)
-                s.connect((self.host, self.port))
+                s.connect(address)
                 log.debug(f"Connection established after {i} retries")
 
                 for p in self.pending:
@@ -83,7 +188,7 @@ class Client:
                 self.pending = []
                 return s
 
-            except ConnectionRefusedError as err:
+            except (ConnectionRefusedError, FileNotFoundError) as err:
                 pending = err
                 time.sleep(sleep_time)
         else:
@@ -95,30 +200,149 @@ class Client:
         return None
 
     def recv(self, timeout=None):
-        """Receive a message from the server"""
-        start = time.time()
-        size = 0
+        """Receive a message from the server, returns None on timeout"""
+        deadline = None
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
 
         while True:
-            size = self.sock.recv_into(self.buffer)
+            # messages already decoded are returned without touching the socket
+            for msg in self._messages():
+                return msg
 
-            if size > 0:
-                break
+            if deadline is not None:
+                timeout = max(deadline - time.monotonic(), 0)
 
-            if timeout is not None and time.time() - start > timeout:
+            if not self._read(timeout):
                 return None
 
-        self.unpacker.feed(memoryview(self.buffer[:size]))
+    def recv_many(self, timeout=None):
+        """Yield all the messages already received,
+        if there are none read once from the socket and yield the messages decoded"""
+        received = False
+
+        for msg in self._messages():
+            received = True
+            yield msg
+
+        if received or not self._read(timeout):
+            return
 
-        try:
-            return next(self.unpacker)
-        except StopIteration:
-            return None
+        yield from self._messages()
+
+    def _messages(self):
+        while self.received:
+            yield self.received.pop(0)
+
+        for msg in self.unpacker:
+            self.boundary = self.unpacker.tell()
+
+            if msg.__class__ is Compressed:
+                msg = self.decompress(msg)
+
+            yield msg
+
+    def decompress(self, compressed):
+        """Returns the decompressed message, raises ValueError if no codec was
+        negotiated or the message is too large"""
+        if self.decompressor is None:
+            raise ValueError("Compressed message received before negotiating a codec")
+
+        return self.decompressor.decompress(compressed)
+
+    def _read(self, timeout=None):
+        """Read the available bytes into the unpacker, returns False on timeout"""
+        if timeout is not None:
+            readable, _, _ = select.select([self.sock], [], [], timeout)
+
+            if not readable:
+                return False
+
+        # a large message is being received, read bigger chunks
+        n = len(self.buffer)
+        if self.fed - self.boundary >= n and n < self.max_buffer_size:
+            self.buffer = byte_buffer(min(n * 2, self.max_buffer_size))
+            self.view = memoryview(self.buffer)
+
+        size = self.sock.recv_into(self.buffer)
+
+        if self.trace_reads:
+            self.read_at = time.monotonic()
+
+        if size == 0:
+            raise ConnectionResetError("Connection closed by peer")
+
+        data = self.view[:size]
+
+        # the unpacker holds no partial message, check for a large bin response
+        if self.fed == self.boundary:
+            header = _bin_response_header(data)
+
+            # the buffer is allocated from the size announced by the peer, the larger
+            # payloads go through the unpacker which rejects them
+            if header is not None and self.zero_copy_threshold <= header[2] <= MAX_SIZE:
+                self.received.append(self._recv_payload(data, *header))
+                return True
+
+        self.unpacker.feed(data)
+        self.fed += size
+        return True
+
+    def _recv_payload(self, data, msgid, header_size, size):
+        """Receive a bin payload directly into its own buffer"""
+        payload = memoryview(bytearray(size))
+
+        received = min(len(data) - header_size, size)
+        payload[:received] = data[header_size : header_size + received]
+
+        while received < size:
+            n = self.sock.recv_into(payload[received:])
+
+            if n == 0:
+                raise ConnectionResetError("Connection closed by peer")
+
+            received += n
+
+        # bytes following the payload belong to the next messages
+        rest = data[header_size + received :]
+        if len(rest) > 0:
+            self.unpacker.feed(rest)
+            self.fed += len(rest)
+
+        return [_RESPONSE_HEADER[1], msgid, None, payload]
 
     def send(self, msg):
         """Send a message to the server"""
-        msg = self.packer.pack(msg)
+        data = self.packer.pack(msg)
+
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+
+        return self._write(data)
+
+    def send_many(self, msgs):
+        """Send multiple messages to the server in a single write"""
+        if self.compressor is not None:
+            compress = self.compressor.compress
+            return self._write(b"".join([compress(self.packer.pack(m)) for m in msgs]))
+
+        return self._write(b"".join([self.packer.pack(msg) for msg in msgs]))
+
+    def set_compression(self, codec, threshold):
+        """Compress the messages larger than ``threshold`` with ``codec``,
+        disable the compression if ``codec`` is None"""
+        self.compressor = None
+        self.decompressor = None
+        if codec is not None:
+            self.compressor = Compressor(codec, threshold)
+            self.decompressor = Decompressor([codec])
+
+    def accept_compression(self, codecs):
+        """Decompress the messages compressed with one of ``codecs``,
+        the server can compress its responses as soon as it picks one"""
+        self.decompressor = Decompressor(codecs)
 
+    def _write(self, msg):
         if self.sock is None:
             self.pending.append(msg)
             return 0
@@ -1,56 +1,243 @@
 import asyncio
+import logging
 import multiprocessing as mp
+import os
+import signal
+import socket
+import weakref
 
-from msgpackio.server import RPCServer
+from msgpackio.server import Bindings, RPCServer
 from msgpackio.rpc import RPCClient
 from msgpackio.client import Client as SyncClient
+from msgpackio.client import unix_path
+
+log = logging.getLogger(__name__)
 
 
 class Server:
-    """Provides the same API as ``msgpackrpc.Server`` for compatibility"""
+    """Provides the same API as ``msgpackrpc.Server`` for compatibility
+
+    Parameters
+    ----------
+    bindings: object
+        Object whose methods are exposed
+
+    executor: callable
+        Factory returning the executor used by the bindings marked with
+        ``binding(executor=True)``, it is called inside the server process
+
+    workers: int
+        Number of server processes, they all accept connections on the same port
+        using ``SO_REUSEPORT`` or a shared listening socket when it is not available
+
+    drain_timeout: float
+        Time given to the in-flight requests to complete when the server is stopped
+
+    topics: Topics
+        Publish/subscribe options, each worker gets a copy,
+        see :class:`~msgpackio.pubsub.Topics`
 
-    def __init__(self, bindings):
+    metrics: bool
+        Time the requests into the histograms of the metrics,
+        see :class:`~msgpackio.server.RPCServer`
+
+    exporter: Callable[[dict], None]
+        Called inside each worker with a snapshot of its metrics every
+        ``export_interval`` seconds and when it stops,
+        see :class:`~msgpackio.metrics.ServerMetrics`
+
+    mp_context: multiprocessing.context.BaseContext
+        Context starting the workers, the default start method when None,
+        the server must be picklable with ``spawn`` and ``forkserver``
+
+    """
+
+    def __init__(
+        self,
+        bindings,
+        executor=None,
+        workers=1,
+        drain_timeout=5,
+        exporter=None,
+        export_interval=10,
+        topics=None,
+        metrics=True,
+        mp_context=None,
+    ):
         self.bindings = bindings
+        self.executor = executor
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self.exporter = exporter
+        self.export_interval = export_interval
+        self.topics = topics
+        self.metrics = metrics
+        self.mp_context = mp_context or mp.get_context()
         self.host = None
         self.port = None
-        self.process = None
+        self.processes = []
+
+    def __getstate__(self):
+        # the workers are started by pickling the server, without its processes
+        state = self.__dict__.copy()
+        state["processes"] = []
+        state["mp_context"] = None
+        return state
 
-    def listen(self, host, port):
+    def listen(self, host, port=None):
+        """Listen on ``host:port`` or on a unix domain socket ``unix:///path/to/socket``"""
         self.host = host
         self.port = port
 
     def start(self):
-        self.process = mp.Process(target=self._start)
-        self.process.start()
+        sock = None
+        path = unix_path(self.host)
+
+        if path is not None:
+            # bound before forking so the workers share it
+            if os.path.exists(path):
+                os.unlink(path)
+
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(path)
+            sock.listen(100)
+
+        elif self.workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+            sock = self._bind()
+
+        try:
+            for _ in range(self.workers):
+                process = self.mp_context.Process(target=self._start, args=(sock,))
+                process.start()
+                self.processes.append(process)
+        except BaseException:
+            # do not leave the workers already started behind
+            self.stop()
+            raise
+        finally:
+            if sock is not None:
+                sock.close()
+
+    def _bind(self):
+        """Listening socket shared by the workers, like ``socket.create_server``
+        which requires Python 3.8"""
+        family, kind, proto, _, address = socket.getaddrinfo(
+            self.host, self.port, type=socket.SOCK_STREAM
+        )[0]
+        sock = socket.socket(family, kind, proto)
+
+        try:
+            if os.name not in ("nt", "cygwin"):
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+            sock.bind(address)
+            sock.listen(100)
+        except OSError:
+            sock.close()
+            raise
+
+        return sock
 
     def stop(self):
-        self.process.terminate()
-        self.process.join()
+        """Stop the workers, in-flight requests are given ``drain_timeout`` to complete"""
+        for process in self.processes:
+            process.terminate()
+
+        for process in self.processes:
+            process.join(self.drain_timeout + 1)
+
+            if process.is_alive():
+                log.warning("Server worker did not stop in time, killing it")
+                process.kill()
+                process.join()
+
+        self.processes = []
+
+        path = unix_path(self.host)
+        if path is not None and os.path.exists(path):
+            os.unlink(path)
 
     def close(self):
         self.stop()
 
-    def _start(self):
+    def _start(self, sock=None):
         async def main():
             loop = asyncio.get_running_loop()
 
-            server = await loop.create_server(
-                lambda: RPCServer(self.bindings), self.host, self.port
-            )
+            executor = None
+            if self.executor is not None:
+                executor = self.executor()
+
+            protocols = weakref.WeakSet()
+            bindings = Bindings(self.bindings, dict(), self.topics)
+
+            export = None
+            if self.exporter is not None:
+                bindings.metrics.add_exporter(self.exporter)
+                export = loop.create_task(self._export(bindings.metrics))
+
+            def factory():
+                protocol = RPCServer(bindings, executor=executor, metrics=self.metrics)
+                protocols.add(protocol)
+                return protocol
+
+            if sock is not None and sock.family == socket.AF_UNIX:
+                server = await loop.create_unix_server(factory, sock=sock)
+            elif sock is not None:
+                server = await loop.create_server(factory, sock=sock)
+            else:
+                server = await loop.create_server(
+                    factory, self.host, self.port, reuse_port=self.workers > 1
+                )
+
+            stopping = loop.create_future()
+            try:
+                loop.add_signal_handler(signal.SIGTERM, stopping.set_result, None)
+            except NotImplementedError:
+                pass
+
+            await stopping
+
+            # stop accepting new connections, then drain the in-flight requests
+            server.close()
+            await self._drain(protocols)
+
+            for protocol in list(protocols):
+                protocol.transport.close()
 
-            async with server:
-                await server.serve_forever()
+            await server.wait_closed()
+
+            if executor is not None:
+                executor.shutdown()
+
+            if export is not None:
+                export.cancel()
+                bindings.metrics.export()
 
         asyncio.run(main())
 
+    async def _export(self, metrics):
+        while True:
+            await asyncio.sleep(self.export_interval)
+            metrics.export()
+
+    async def _drain(self, protocols):
+        pending = [protocol.drain() for protocol in list(protocols)]
+
+        try:
+            await asyncio.wait_for(asyncio.gather(*pending), self.drain_timeout)
+        except asyncio.TimeoutError:
+            log.warning("Server stopped with in-flight requests")
+
 
 class Client:
-    """Provides the same API as ``msgpackrpc.Client`` for compatibility"""
+    """Provides the same API as ``msgpackrpc.Client`` for compatibility,
+    extra keyword arguments are forwarded to :class:`RPCClient`"""
 
-    def __init__(self, host, port):
+    def __init__(self, host, port=None, **kwargs):
         self.port = port
         self.host = host
-        self.client = RPCClient(SyncClient(self.host, self.port))
+        self.client = RPCClient(SyncClient(self.host, self.port), **kwargs)
 
     def __enter__(self):
         return self
@@ -65,8 +252,23 @@ class Client:
     def notify(self, method, *args):
         return self.client.notify(method, *args)
 
-    def call(self, method, *args):
-        return self.client.call(method, *args)
+    def call(self, method, *args, timeout=None):
+        return self.client.call(method, *args, timeout=timeout)
+
+    def call_async(self, method, *args, timeout=None):
+        return self.client.call_async(method, *args, timeout=timeout)
+
+    def call_many(self, calls, timeout=None, return_exceptions=False):
+        return self.client.call_many(calls, timeout, return_exceptions)
+
+    def call_stream(self, method, *args, window=16):
+        return self.client.call_stream(method, *args, window=window)
+
+    def subscribe(self, topic, callback):
+        return self.client.subscribe(topic, callback)
+
+    def unsubscribe(self, topic):
+        return self.client.unsubscribe(topic)
 
-    def call_async(self, method, *args):
-        return self.client.call_async(method, *args)
+    def publish(self, topic, message):
+        return self.client.publish(topic, message)
@@ -0,0 +1,218 @@
+"""Compression of the large messages of a connection
+
+The client proposes its codecs when it connects, the server picks the first one
+it supports. From then on both sides wrap the messages larger than the threshold
+in an extension type holding the codec and the compressed message, smaller
+messages are sent as they are.
+
+``zlib`` is always available, ``lz4`` and ``zstd`` are used when ``lz4`` and
+``zstandard`` are installed.
+
+A connection only decompresses the messages compressed with the codec it
+negotiated, and rejects the messages larger than ``max_size`` once decompressed.
+
+Examples
+--------
+
+.. code-block:: python
+
+   client = Client("localhost", 18800, compression=True, compression_threshold=65536)
+
+"""
+
+import zlib
+
+import msgpack
+
+from msgpackio.ext import EXT_COMPRESSED, registry
+
+# built-in method of the server, ``[codecs, threshold]`` => name of the codec or None
+FUNCNAME_NEGOTIATE = "__compression__"
+# largest decompressed message, msgpack's default max_buffer_size
+MAX_SIZE = 100 * 1024 * 1024
+
+
+class Codec:
+    """``decompress(data, max_size)`` raises ValueError if the message
+    is larger than ``max_size`` bytes once decompressed"""
+
+    def __init__(self, name, code, compress, decompress):
+        self.name = name
+        self.code = code
+        self.compress = compress
+        self.decompress = decompress
+
+
+# name => Codec, in order of preference
+CODECS = dict()
+# code => Codec
+_BY_CODE = dict()
+
+
+def register(codec):
+    CODECS[codec.name] = codec
+    _BY_CODE[codec.code] = codec
+
+
+def _too_large(max_size):
+    return ValueError(f"Compressed message larger than {max_size} bytes")
+
+
+try:
+    import zstandard
+
+    _zstd_compressor = zstandard.ZstdCompressor(level=3)
+    _zstd_decompressor = zstandard.ZstdDecompressor()
+
+    def _zstd_decompress(data, max_size):
+        try:
+            # the size is in the frame header unless the sender left it out
+            if zstandard.frame_content_size(data) > max_size:
+                raise _too_large(max_size)
+
+            return _zstd_decompressor.decompress(data, max_output_size=max_size)
+        except zstandard.ZstdError as err:
+            raise ValueError(str(err)) from err
+
+    register(Codec("zstd", 3, _zstd_compressor.compress, _zstd_decompress))
+
+except ImportError:
+    pass
+
+try:
+    import lz4.frame
+
+    def _lz4_decompress(data, max_size):
+        decompressor = lz4.frame.LZ4FrameDecompressor()
+
+        try:
+            packed = decompressor.decompress(data, max_length=max_size + 1)
+        except RuntimeError as err:
+            raise ValueError(str(err)) from err
+
+        if len(packed) > max_size:
+            raise _too_large(max_size)
+
+        if not decompressor.eof:
+            raise ValueError("Truncated lz4 frame")
+
+        return packed
+
+    register(Codec("lz4", 2, lz4.frame.compress, _lz4_decompress))
+
+except ImportError:
+    pass
+
+
+def _zlib_decompress(data, max_size):
+    decompressor = zlib.decompressobj()
+
+    try:
+        packed = decompressor.decompress(data, max_size + 1)
+    except zlib.error as err:
+        raise ValueError(str(err)) from err
+
+    if len(packed) > max_size:
+        raise _too_large(max_size)
+
+    if not decompressor.eof:
+        raise ValueError("Truncated zlib stream")
+
+    return packed
+
+
+# favour speed, the messages are compressed on the request path
+register(Codec("zlib", 1, lambda data: zlib.compress(data, 1), _zlib_decompress))
+
+
+def available():
+    """Names of the codecs installed, in order of preference"""
+    return list(CODECS)
+
+
+def negotiate(proposed):
+    """Returns the first codec of ``proposed`` that is available, or None"""
+    for name in proposed:
+        codec = CODECS.get(name)
+
+        if codec is not None:
+            return codec
+
+    return None
+
+
+class Compressed:
+    """A message compressed with the codec ``code``, see :class:`Decompressor`"""
+
+    __slots__ = ("code", "data")
+
+    def __init__(self, code, data):
+        self.code = code
+        self.data = data
+
+
+def _encode(compressed):
+    return bytes([compressed.code]) + compressed.data
+
+
+def _decode(data):
+    # left compressed, only the connections that negotiated a codec decompress it
+    return Compressed(data[0], memoryview(data)[1:])
+
+
+registry.register(Compressed, EXT_COMPRESSED, _encode, _decode)
+
+
+class Compressor:
+    """Compress the packed messages larger than ``threshold`` bytes
+
+    Messages that do not shrink are sent uncompressed.
+    """
+
+    def __init__(self, codec, threshold):
+        self.codec = codec
+        self.threshold = threshold
+        self.packer = registry.packer()
+
+    def compress(self, data):
+        if len(data) < self.threshold:
+            return data
+
+        compressed = self.codec.compress(data)
+
+        # the extension header & the codec take up to 7 bytes
+        if len(compressed) + 7 >= len(data):
+            return data
+
+        return self.packer.pack(Compressed(self.codec.code, compressed))
+
+
+class Decompressor:
+    """Decode the messages of a connection compressed with one of ``codecs``
+
+    Parameters
+    ----------
+    codecs: List[Codec]
+        Codecs negotiated by the connection
+
+    max_size: int
+        Messages larger than this size in bytes once decompressed are rejected
+
+    """
+
+    def __init__(self, codecs, max_size=MAX_SIZE, use_list=True):
+        self.codecs = {codec.code: codec for codec in codecs}
+        self.max_size = max_size
+        self.use_list = use_list
+
+    def decompress(self, compressed):
+        """Returns the message, raises ValueError if it cannot be accepted"""
+        codec = self.codecs.get(compressed.code)
+
+        if codec is None:
+            raise ValueError(f"Message compressed with codec {compressed.code}")
+
+        packed = codec.decompress(compressed.data, self.max_size)
+        return msgpack.unpackb(
+            packed, ext_hook=registry.ext_hook, timestamp=3, use_list=self.use_list
+        )
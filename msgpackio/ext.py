@@ -0,0 +1,117 @@
+"""msgpack extension types shared by the clients and the server
+
+Examples
+--------
+
+.. code-block:: python
+
+   from msgpackio.ext import registry
+
+   registry.register(Point, 42, lambda p: struct.pack("dd", p.x, p.y),
+                     lambda data: Point(*struct.unpack("dd", data)))
+
+"""
+import datetime
+import struct
+
+import msgpack
+
+EXT_NDARRAY = 1
+# a whole message compressed, see msgpackio.compression
+EXT_COMPRESSED = 2
+
+
+class ExtRegistry:
+    """Map python types to msgpack extension types"""
+
+    def __init__(self):
+        self.encoders = dict()
+        self.decoders = dict()
+
+    def register(self, cls, code, encode, decode):
+        """Encode instances of ``cls`` as the extension type ``code``
+
+        Parameters
+        ----------
+        encode: Callable[[cls], bytes]
+
+        decode: Callable[[bytes], cls]
+        """
+        if code in self.decoders:
+            raise ValueError(f"Extension type {code} is already registered")
+
+        self.encoders[cls] = (code, encode)
+        self.decoders[code] = decode
+
+    def default(self, obj):
+        encoder = self.encoders.get(type(obj))
+
+        if encoder is None:
+            for cls, value in self.encoders.items():
+                if isinstance(obj, cls):
+                    encoder = value
+                    break
+
+        if encoder is not None:
+            code, encode = encoder
+            return msgpack.ExtType(code, encode(obj))
+
+        if isinstance(obj, datetime.datetime):
+            if obj.tzinfo is None:
+                obj = obj.replace(tzinfo=datetime.timezone.utc)
+
+            return msgpack.Timestamp.from_datetime(obj)
+
+        return obj.to_msgpack()
+
+    def ext_hook(self, code, data):
+        decode = self.decoders.get(code)
+
+        if decode is None:
+            return msgpack.ExtType(code, data)
+
+        return decode(data)
+
+    def packer(self, **kwargs):
+        return msgpack.Packer(default=self.default, **kwargs)
+
+    def unpacker(self, **kwargs):
+        return msgpack.Unpacker(ext_hook=self.ext_hook, timestamp=3, **kwargs)
+
+    def packb(self, obj):
+        return msgpack.packb(obj, default=self.default)
+
+
+registry = ExtRegistry()
+
+try:
+    import numpy as np
+    from numpy.lib.format import descr_to_dtype, dtype_to_descr
+
+    # [header size][msgpack [dtype descr, shape]][raw buffer], descr as in .npy files
+    _HEADER_SIZE = struct.Struct("<H")
+
+    def _encode_ndarray(array):
+        if array.dtype.hasobject:
+            raise TypeError(f"Cannot serialize arrays of Python objects: {array.dtype}")
+
+        header = msgpack.packb([dtype_to_descr(array.dtype), array.shape])
+        array = np.ascontiguousarray(array)
+        raw = array.reshape(-1).view(np.uint8).data
+
+        # join copies the raw buffer once, ExtType only accepts bytes
+        return b"".join([_HEADER_SIZE.pack(len(header)), header, raw])
+
+    def _decode_ndarray(data):
+        (size,) = _HEADER_SIZE.unpack_from(data)
+        offset = _HEADER_SIZE.size + size
+        descr, shape = msgpack.unpackb(data[_HEADER_SIZE.size : offset])
+
+        # the array is a read-only view over the received bytes
+        dtype = descr_to_dtype(descr)
+        return np.frombuffer(data, dtype=dtype, offset=offset).reshape(shape)
+
+    registry.register(np.ndarray, EXT_NDARRAY, _encode_ndarray, _decode_ndarray)
+
+except ImportError:
+    pass
@@ -1,4 +1,4 @@
-import time
+import threading
 
 from msgpackio.exceptions import RemoteException
 
@@ -10,17 +10,33 @@ class _Nothing:
 
 
 class Future:
-    def __init__(self, client, msgid):
+    # time.monotonic() timestamps set when the client is traced
+    sent_at = None
+    decoded_at = None
+
+    def __init__(self, client, msgid, deadline=None):
         self.client = client
         self.msgid = msgid
+        # time.monotonic() after which the server drops the request
+        self.deadline = deadline
         self.result = _Nothing
         self.error: Exception = None
+        self._done = threading.Event()
+
+    def set_result(self, error, result):
+        """Resolve the future and wake up the threads waiting on it"""
+        self.error = error
+        self.result = result
+        self._done.set()
 
     def get(self, timeout=None):
         if not self.ready():
             self.client._wait_future(timeout, target=self)
 
         if self.error is not None:
+            if isinstance(self.error, Exception):
+                raise self.error
+
             raise RemoteException.from_msgpack(self.error)
 
         return self.result
@@ -35,7 +51,7 @@ class Future:
             pass
 
     def ready(self):
-        return not (self.result is _Nothing and self.error is None)
+        return self._done.is_set()
 
     def successful(self):
         if not self.ready():
@@ -0,0 +1,228 @@
+"""Per method metrics of the server
+
+The metrics are plain counters updated from the event loop thread only,
+they do not need any lock. Each server process keeps its own metrics.
+
+Durations are appended to a flat list by the request path and folded
+into the histograms in bulk.
+
+Examples
+--------
+
+.. code-block:: python
+
+   client.call("__stats__")
+   # = > {"methods": {"sum": {"requests": 10, "errors": 0, ...}}, "unknown": 0}
+
+"""
+
+import logging
+import os
+import struct
+from array import array
+from collections import Counter
+
+log = logging.getLogger(__name__)
+
+# a float is bucketed by its exponent and the 6 most significant bits of its mantissa
+_MANTISSA_SHIFT = 52 - 6
+_DOUBLE = struct.Struct("<d")
+_UINT64 = struct.Struct("<Q")
+
+
+def _buckets(values):
+    """Returns the bucket of every value"""
+    bits = memoryview(array("d", values)).cast("B").cast("Q")
+    return [b >> _MANTISSA_SHIFT for b in bits]
+
+
+try:
+    # numpy buckets the samples ~5x faster
+    import numpy as np
+
+    def _count(values):
+        """Returns ``{bucket: count}`` of the values"""
+        bits = np.array(values, dtype="<f8").view("<u8") >> _MANTISSA_SHIFT
+        buckets, counts = np.unique(bits, return_counts=True)
+        return dict(zip(buckets.tolist(), counts.tolist()))
+
+except ImportError:
+
+    def _count(values):
+        """Returns ``{bucket: count}`` of the values"""
+        return Counter(_buckets(values))
+
+
+def _lower_bound(bucket):
+    return _DOUBLE.unpack(_UINT64.pack(bucket << _MANTISSA_SHIFT))[0]
+
+
+class Histogram:
+    """Log-linear histogram of durations in the style of HDR histograms
+
+    Values are grouped in buckets whose width is 1/64 of their value,
+    the relative error of the percentiles is at most ~1.5%.
+    """
+
+    def __init__(self):
+        # bucket => count
+        self.counts = Counter()
+        self.count = 0
+
+    def record(self, seconds):
+        self.update({_buckets([seconds])[0]: 1})
+
+    def update(self, counts):
+        """Add ``{bucket: count}`` to the histogram"""
+        self.counts.update(counts)
+        self.count += sum(counts.values())
+
+    def percentile(self, p):
+        """Returns the lower bound of the bucket holding the ``p`` percentile in seconds"""
+        if self.count == 0:
+            return 0
+
+        rank = p * self.count
+        seen = 0
+
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+
+            if seen >= rank:
+                break
+
+        return _lower_bound(bucket)
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.count += other.count
+
+    def summary(self):
+        total = sum(_lower_bound(b) * n for b, n in self.counts.items())
+
+        return dict(
+            count=self.count,
+            mean=total / self.count if self.count else 0,
+            max=self.percentile(1),
+            p50=self.percentile(0.5),
+            p90=self.percentile(0.9),
+            p99=self.percentile(0.99),
+            p999=self.percentile(0.999),
+        )
+
+
+class MethodMetrics:
+    """Metrics of a single method
+
+    Attributes
+    ----------
+    handler_time: Histogram
+        Time spent running the binding, one sample per completed request
+
+    queue_time: Histogram
+        Time between the reception of the request and the start of the binding
+
+    Notes
+    -----
+    The requests are counted when they complete or expire, see ``in_flight``
+    for the scheduled requests that are still running.
+
+    """
+
+    # number of buffered floats before they are folded into the histograms
+    FOLD_SIZE = 2 * 4096
+
+    def __init__(self):
+        # queue time, handler time, ... of the requests not folded yet
+        self.samples = []
+        self.notifications = 0
+        # requests completed by a server created with metrics=False
+        self.untimed = 0
+        self.errors = 0
+        self.expired = 0
+        self.in_flight = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.handler_time = Histogram()
+        self.queue_time = Histogram()
+        # ResponseCache of the method, if its results are cached
+        self.cache = None
+
+    def fold(self):
+        """Move the buffered samples to the histograms"""
+        samples = self.samples
+        if not samples:
+            return
+
+        self.queue_time.update(_count(samples[0::2]))
+        self.handler_time.update(_count(samples[1::2]))
+        del samples[:]
+
+    def snapshot(self):
+        self.fold()
+
+        snapshot = dict(
+            requests=self.handler_time.count + self.untimed + self.expired,
+            notifications=self.notifications,
+            errors=self.errors,
+            expired=self.expired,
+            in_flight=self.in_flight,
+            bytes_in=self.bytes_in,
+            bytes_out=self.bytes_out,
+            handler_time=self.handler_time.summary(),
+            queue_time=self.queue_time.summary(),
+        )
+
+        if self.cache is not None:
+            snapshot["cache"] = self.cache.stats()
+
+        return snapshot
+
+
+class ServerMetrics:
+    """Metrics of all the methods of a :class:`~msgpackio.server.Bindings`
+
+    Parameters
+    ----------
+    exporters: List[Callable[[dict], None]]
+        Functions receiving a snapshot of the metrics when :meth:`export` is called
+
+    """
+
+    def __init__(self, exporters=None):
+        self.methods = dict()
+        self.unknown = 0
+        self.exporters = list(exporters or [])
+
+    def method(self, name):
+        """Returns the metrics of ``name``, creating them if needed"""
+        metrics = self.methods.get(name)
+
+        if metrics is None:
+            metrics = MethodMetrics()
+            self.methods[name] = metrics
+
+        return metrics
+
+    def snapshot(self):
+        return dict(
+            pid=os.getpid(),
+            methods={name: m.snapshot() for name, m in self.methods.items()},
+            unknown=self.unknown,
+        )
+
+    def add_exporter(self, exporter):
+        self.exporters.append(exporter)
+
+    def export(self):
+        """Send a snapshot to the exporters"""
+        if not self.exporters:
+            return
+
+        snapshot = self.snapshot()
+
+        for exporter in self.exporters:
+            try:
+                exporter(snapshot)
+            except Exception:
+                log.exception("Metrics exporter failed")
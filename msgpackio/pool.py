@@ -0,0 +1,242 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from msgpackio.client import Client
+from msgpackio.exceptions import RemoteException
+from msgpackio.rpc import RPCClient
+
+log = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of persistent :class:`RPCClient`
+
+    Parameters
+    ----------
+    size: int
+        Maximum number of open connections
+
+    max_idle: float
+        Connections unused for longer than this are closed
+
+    check_interval: float
+        Connections unused for longer than this are pinged before being handed out
+
+    Examples
+    --------
+
+    .. code-block:: python
+
+       pool = ConnectionPool("localhost", 18800, size=8)
+
+       with pool.connection() as client:
+           result = client.call("sum", 1, 2)  # = > 3
+
+    """
+
+    FUNCNAME_PING = "ping"
+
+    def __init__(
+        self, host, port=None, size=8, max_idle=60, check_interval=1, timeout=5
+    ):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+        self.timeout = timeout
+
+        self.cond = threading.Condition()
+        # (last used, client), the most recently used is last
+        self.idle = []
+        self.opened = 0
+        self.closed = False
+
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.wait_time = 0
+        self.evicted = 0
+
+    def acquire(self, timeout=None):
+        """Returns a connected client, wait for one to be released if the pool is full"""
+        if timeout is None:
+            timeout = self.timeout
+
+        while True:
+            client, last_used = self._acquire(timeout)
+
+            if client is None:
+                return self._open()
+
+            if self._healthy(client, last_used):
+                return client
+
+            self._evict(client)
+
+    def _acquire(self, timeout):
+        start = None
+        expired = []
+
+        try:
+            with self.cond:
+                while True:
+                    if self.closed:
+                        raise RuntimeError("Pool is closed")
+
+                    expired += self._evict_idle()
+
+                    if self.idle:
+                        last_used, client = self.idle.pop()
+                        self.hits += 1
+                        break
+
+                    if self.opened < self.size:
+                        self.opened += 1
+                        self.misses += 1
+                        client, last_used = None, None
+                        break
+
+                    if start is None:
+                        start = time.monotonic()
+                        self.waits += 1
+
+                    remaining = timeout - (time.monotonic() - start)
+                    if remaining <= 0 or not self.cond.wait(remaining):
+                        self.wait_time += time.monotonic() - start
+                        raise PoolTimeout("No connection available")
+
+                if start is not None:
+                    self.wait_time += time.monotonic() - start
+        finally:
+            # closing joins the reader threads, the lock is not held
+            for expired_client in expired:
+                expired_client.close()
+
+        return client, last_used
+
+    def _open(self):
+        try:
+            return RPCClient(Client(self.host, self.port))
+        except Exception:
+            with self.cond:
+                self.opened -= 1
+                self.cond.notify()
+            raise
+
+    def release(self, client):
+        """Return a client to the pool"""
+        if not self._alive(client):
+            self._evict(client)
+            return
+
+        with self.cond:
+            closed = self.closed
+
+            if closed:
+                self.opened -= 1
+            else:
+                self.idle.append((time.monotonic(), client))
+                self.cond.notify()
+
+        if closed:
+            client.close()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        client = self.acquire(timeout)
+        try:
+            yield client
+        finally:
+            self.release(client)
+
+    def call(self, method, *args):
+        with self.connection() as client:
+            return client.call(method, *args)
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            idle = self.idle
+            self.idle = []
+            self.opened -= len(idle)
+            self.cond.notify_all()
+
+        for _, client in idle:
+            client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, a, b, c):
+        self.close()
+        return
+
+    def stats(self):
+        with self.cond:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                waits=self.waits,
+                wait_time=self.wait_time,
+                evicted=self.evicted,
+                opened=self.opened,
+                idle=len(self.idle),
+            )
+
+    @staticmethod
+    def _alive(client):
+        return client.keep_promises and client.promise_keeper.is_alive()
+
+    def _healthy(self, client, last_used):
+        if not self._alive(client):
+            return False
+
+        if time.monotonic() - last_used < self.check_interval:
+            return True
+
+        try:
+            client.call_async(ConnectionPool.FUNCNAME_PING).get(self.timeout)
+        except RemoteException:
+            # the server replied, even if it does not implement ping
+            pass
+        except Exception as err:
+            log.debug(f"Connection failed its health check: {err}")
+            return False
+
+        return True
+
+    def _evict(self, client):
+        client.close()
+
+        with self.cond:
+            self.opened -= 1
+            self.evicted += 1
+            self.cond.notify()
+
+    def _evict_idle(self):
+        """Remove the connections unused for longer than ``max_idle`` and returns them,
+        holds the lock, the caller closes them once it is released"""
+        now = time.monotonic()
+        expired = 0
+
+        # idle is sorted by last use, oldest first
+        for last_used, _ in self.idle:
+            if now - last_used < self.max_idle:
+                break
+            expired += 1
+
+        if expired == 0:
+            return []
+
+        clients = [client for _, client in self.idle[:expired]]
+        self.idle = self.idle[expired:]
+        self.opened -= expired
+        self.evicted += expired
+        return clients
@@ -0,0 +1,195 @@
+"""Publish/subscribe topics of a server
+
+Clients subscribe to topics over their connection, a message published on a topic
+is packed once and the same bytes are written to every subscriber as a
+``[NOTIFY, "__message__", [topic, message]]`` notification.
+
+A subscriber that does not read fast enough pauses its transport, its messages
+are then queued up to ``max_queue``. When the queue is full the subscriber
+either loses its oldest or newest messages or is disconnected.
+
+Each server process keeps its own topics.
+
+Examples
+--------
+
+.. code-block:: python
+
+   client.subscribe("prices", lambda message: print(message))
+   client.publish("prices", {"EUR": 1.08})  # = > number of subscribers
+
+"""
+
+import logging
+from collections import deque
+
+from msgpackio.ext import registry
+from msgpackio.rpc import NOTIFY
+
+log = logging.getLogger(__name__)
+
+FUNCNAME_SUBSCRIBE = "__subscribe__"
+FUNCNAME_UNSUBSCRIBE = "__unsubscribe__"
+FUNCNAME_PUBLISH = "__publish__"
+# notification sent to the subscribers, ``[topic, message]``
+FUNCNAME_MESSAGE = "__message__"
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+DISCONNECT = "disconnect"
+
+
+class Subscriber:
+    """Connection subscribed to one or more topics, see :class:`Topics`"""
+
+    def __init__(self, protocol, max_queue, policy):
+        self.protocol = protocol
+        self.max_queue = max_queue
+        self.policy = policy
+        self.topics = set()
+        # messages waiting for the transport to resume writing
+        self.queue = deque()
+        self.dropped = 0
+        self.closed = False
+
+    def send(self, data):
+        """Write ``data`` or queue it if the client is not reading, returns False if
+        the message was dropped"""
+        if self.closed:
+            return False
+
+        if not self.protocol.writing_paused and not self.queue:
+            self.protocol.write(data)
+            return True
+
+        if len(self.queue) < self.max_queue:
+            self.queue.append(data)
+            return True
+
+        if self.policy == DISCONNECT:
+            log.warning("Subscriber is too slow, disconnecting it")
+            self.closed = True
+            self.queue.clear()
+            self.protocol.transport.abort()
+            return False
+
+        self.dropped += 1
+
+        if self.policy == DROP_OLDEST:
+            self.queue.popleft()
+            self.queue.append(data)
+
+        return False
+
+    def drain(self):
+        """Write the queued messages until the transport pauses again"""
+        queue = self.queue
+
+        # the writes are flushed every flush_size bytes, which can pause the transport
+        while queue and not self.protocol.writing_paused:
+            self.protocol.write(queue.popleft())
+
+        self.protocol.flush()
+
+
+class Topics:
+    """Subscribers of each topic, shared by the connections of a server process
+
+    Parameters
+    ----------
+    max_queue: int
+        Number of messages queued for a subscriber that is not reading
+
+    policy: str
+        What happens to a subscriber whose queue is full,
+        ``drop_oldest``, ``drop_newest`` or ``disconnect``
+
+    """
+
+    def __init__(self, max_queue=1024, policy=DROP_OLDEST):
+        if policy not in (DROP_OLDEST, DROP_NEWEST, DISCONNECT):
+            raise ValueError(f"Unknown policy {policy}")
+
+        self.max_queue = max_queue
+        self.policy = policy
+        # topic => set of Subscriber
+        self.topics = dict()
+        # protocol => Subscriber
+        self.subscribers = dict()
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, protocol, topic):
+        subscriber = self.subscribers.get(protocol)
+
+        if subscriber is None:
+            subscriber = Subscriber(protocol, self.max_queue, self.policy)
+            self.subscribers[protocol] = subscriber
+
+        subscriber.topics.add(topic)
+        self.topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, protocol, topic=None):
+        """Unsubscribe ``protocol`` from ``topic`` or from all its topics if None"""
+        subscriber = self.subscribers.get(protocol)
+
+        if subscriber is None:
+            return
+
+        topics = list(subscriber.topics) if topic is None else [topic]
+
+        for name in topics:
+            subscriber.topics.discard(name)
+            subscribers = self.topics.get(name)
+
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+
+                if not subscribers:
+                    del self.topics[name]
+
+        if not subscriber.topics:
+            del self.subscribers[protocol]
+
+    def publish(self, topic, message):
+        """Send ``message`` to the subscribers of ``topic``, returns their number"""
+        subscribers = self.topics.get(topic)
+        self.published += 1
+
+        if not subscribers:
+            return 0
+
+        # packed once for all the subscribers
+        data = registry.packb((NOTIFY, FUNCNAME_MESSAGE, (topic, message)))
+        # (codec, threshold) => compressed data
+        compressed = dict()
+
+        for subscriber in list(subscribers):
+            payload = data
+            compressor = subscriber.protocol.compressor
+
+            if compressor is not None:
+                key = (compressor.codec.name, compressor.threshold)
+                payload = compressed.get(key)
+
+                if payload is None:
+                    payload = compressed[key] = compressor.compress(data)
+
+            if subscriber.send(payload):
+                self.delivered += 1
+            else:
+                self.dropped += 1
+
+        return len(subscribers)
+
+    def stats(self):
+        return dict(
+            topics={topic: len(subs) for topic, subs in self.topics.items()},
+            subscribers=len(self.subscribers),
+            published=self.published,
+            delivered=self.delivered,
+            dropped=self.dropped,
+            queued=sum(len(s.queue) for s in self.subscribers.values()),
+        )
@@ -1,21 +1,37 @@
-from enum import Enum
-import time
+import concurrent.futures
+import heapq
 import logging
 import threading
-import select
-
+import time
 
+from msgpackio.cache import (
+    FUNCNAME_CACHEABLE,
+    FUNCNAME_INVALIDATE,
+    ClientCache,
+    call_key,
+)
 from msgpackio.client import Client
+from msgpackio.compression import CODECS, FUNCNAME_NEGOTIATE, available, negotiate
+from msgpackio.exceptions import NoMethod, RemoteException
 from msgpackio.future import Future
+from msgpackio.stream import Stream
 
 
 class LostFuture(Exception):
     pass
 
 
+class BackpressureError(Exception):
+    pass
+
+
 REQUEST = 0
 RESPONSE = 1
 NOTIFY = 2
+# [CHUNK, msgid, chunk] a part of a streamed response, sent before its RESPONSE
+CHUNK = 3
+# [CREDIT, msgid, n] the client can receive n more chunks, n < 0 cancels the stream
+CREDIT = 4
 
 
 def _seq():
@@ -33,51 +49,620 @@ log = logging.getLogger(__name__)
 
 
 class RPCClient:
-    def __init__(self, client: Client):
+    """Call remote methods, responses are received by a background thread
+
+    Parameters
+    ----------
+    client: Client
+        Connection to the server
+
+    max_in_flight: int
+        Maximum number of requests waiting for a response, unbounded if None
+
+    block: bool
+        When the window is full, block until a response arrives
+        or raise :class:`BackpressureError`
+
+    tracer: Tracer
+        Receives the timestamps of the phases of every call,
+        see :mod:`msgpackio.tracing`
+
+    compression: bool or List[str]
+        Codecs proposed to the server in order of preference, True proposes all the
+        codecs available, see :mod:`msgpackio.compression`
+
+    compression_threshold: int
+        Only the messages larger than this size in bytes are compressed
+
+    cache: bool
+        Cache the results of :meth:`call` for the methods the server marks as
+        cacheable, see :class:`~msgpackio.cache.ClientCache`
+
+    cache_size: int
+        Maximum number of results cached
+
+    bindings: object
+        Object whose public methods the server can call or notify,
+        they run on the thread receiving the responses so they must not block
+        nor wait for a call to the server
+
+    Notes
+    -----
+    Calls made with a ``timeout`` send it along with the request,
+    the server drops the request once it expires, and the client evicts its future.
+
+    """
+
+    FUNCNAME_SUBSCRIBE = "__subscribe__"
+    FUNCNAME_UNSUBSCRIBE = "__unsubscribe__"
+    FUNCNAME_PUBLISH = "__publish__"
+    FUNCNAME_MESSAGE = "__message__"
+
+    def __init__(
+        self,
+        client: Client,
+        max_in_flight=None,
+        block=True,
+        tracer=None,
+        compression=None,
+        compression_threshold=65536,
+        cache=False,
+        cache_size=1024,
+        bindings=None,
+    ):
         self.client = client
         self.client.connect()
 
+        self.tracer = tracer
+        self.client.trace_reads = tracer is not None
+
         self.generator = _seq()
         self._pending_results = dict()
+        # msgid => Stream of the streamed responses
+        self._streams = dict()
+        # method => function handling the notifications of the server
+        self._notify_handlers = {
+            FUNCNAME_INVALIDATE: self._invalidate,
+            RPCClient.FUNCNAME_MESSAGE: self._on_published,
+        }
+        # topic => callbacks receiving its messages
+        self._topics = dict()
+        self.bindings = bindings
+        # heap of (deadline, msgid, future) of the requests sent with a timeout
+        self._deadlines = []
+
+        self.max_in_flight = max_in_flight
+        self.block = block
+        self.window = None
+        if max_in_flight is not None:
+            self.window = threading.Semaphore(max_in_flight)
+
+        self.peak_in_flight = 0
+        self.blocked = 0
+        self.blocked_time = 0
 
-        self.sockets = [self.client.sock]
         self.keep_promises = True
+        # set once the thread receiving the responses has stopped
+        self.lost = False
         self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
         self.promise_keeper = threading.Thread(target=self._fetch_results)
         self.promise_keeper.daemon = True
         self.promise_keeper.start()
 
+        self.codec = None
+        self.cache = None
+
+        if compression:
+            self.negotiate_compression(compression, compression_threshold)
+
+        if cache:
+            self.enable_cache(cache_size)
+
+    def negotiate_compression(self, codecs=True, threshold=65536):
+        """Agree on a codec with the server, returns its name or None
+
+        The server answers with a codec before compressing its responses,
+        the requests are compressed once the answer is received.
+        """
+        if codecs is True:
+            codecs = available()
+
+        self.client.accept_compression([CODECS[n] for n in codecs if n in CODECS])
+
+        try:
+            name = self.call(FUNCNAME_NEGOTIATE, list(codecs), threshold)
+        except RemoteException:
+            # the server does not support compression
+            name = None
+
+        codec = None
+        if name is not None:
+            codec = negotiate([name])
+
+        with self.write_lock:
+            self.client.set_compression(codec, threshold)
+
+        self.codec = name
+        return name
+
     def _fetch_results(self):
-        while self.keep_promises:
-            readable, _, _ = select.select(self.sockets, [], [], 0.01)
+        """Block on the socket and resolve futures as responses arrive"""
+        tracer = self.tracer
+
+        try:
+            while self.keep_promises:
+                # a single read can hold many responses
+                for value in self.client.recv_many():
+                    if value[0] != RESPONSE:
+                        self._on_message(value)
+                    elif tracer is None:
+                        self._set_future(value)
+                    else:
+                        self._set_future(value, time.monotonic())
+
+                self._evict_expired()
+
+        except (OSError, ValueError) as err:
+            if self.keep_promises:
+                log.debug(f"Connection lost: {err}")
+
+        self._cancel_pending()
+
+    def _cancel_pending(self):
+        """Fail every pending future, nothing will resolve them anymore"""
+        with self.lock:
+            self.lost = True
+            pending = self._pending_results
+            self._pending_results = dict()
+            streams = self._streams
+            self._streams = dict()
 
-            for _ in readable:
-                value = self.client.recv(0)
-                self._set_future(value)
+        for future in pending.values():
+            self._release_slot()
+            future.set_result(LostFuture("Connection lost"), None)
 
-    def call(self, method, *args):
-        result = self.send_request(method, args).get()
-        return result
+        for stream in streams.values():
+            stream.end()
+
+        # the invalidations sent from now on would be missed
+        if self.cache is not None:
+            self.cache.invalidate()
+
+    def _acquire_slot(self, blocking=True):
+        """Reserve a slot in the in-flight window, returns False if it is full"""
+        if self.window is None or self.window.acquire(blocking=False):
+            return True
 
-    def call_async(self, method, *args):
-        return self.send_request(method, args)
+        if not blocking:
+            return False
 
-    def send_request(self, method, args):
-        msgid = next(self.generator)
-        future = Future(self, msgid)
+        if not self.block:
+            raise BackpressureError(f"{self.max_in_flight} requests are in flight")
+
+        start = time.monotonic()
+
+        # requests that expired free their slots
+        while not self.window.acquire(timeout=self._next_deadline()):
+            self._evict_expired()
 
         with self.lock:
+            self.blocked += 1
+            self.blocked_time += time.monotonic() - start
+
+        return True
+
+    def _release_slot(self):
+        if self.window is not None:
+            self.window.release()
+
+    def _add_pending(self, timeout=None, window=None):
+        """Register the future of a new request, its slot must be reserved,
+        raises LostFuture if the connection was lost
+
+        The request is streamed if a window is given, its Stream is returned instead"""
+        deadline = None
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+
+        with self.lock:
+            if self.lost:
+                self._release_slot()
+                raise LostFuture("Connection lost")
+
+            msgid = next(self.generator)
+            future = Future(self, msgid, deadline)
             self._pending_results[msgid] = future
+            self.peak_in_flight = max(self.peak_in_flight, len(self._pending_results))
+
+            if deadline is not None:
+                heapq.heappush(self._deadlines, (deadline, msgid, future))
+
+            if window is not None:
+                future = self._streams[msgid] = Stream(self, future, window)
 
-        self.client.send([REQUEST, msgid, method, args])
         return future
 
+    def _next_deadline(self):
+        """Time until the next request expires"""
+        with self.lock:
+            if not self._deadlines:
+                return None
+
+            return max(self._deadlines[0][0] - time.monotonic(), 0)
+
+    def _evict_expired(self):
+        """Fail the futures of the requests whose deadline has passed"""
+        if not self._deadlines:
+            return
+
+        now = time.monotonic()
+        expired = []
+
+        with self.lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, msgid, future = heapq.heappop(self._deadlines)
+
+                if self._pending_results.get(msgid) is future:
+                    del self._pending_results[msgid]
+                    expired.append(future)
+
+        for future in expired:
+            self._release_slot()
+            future.set_result(TimeoutError("Deadline exceeded"), None)
+
+    def _expire(self, future):
+        """Fail a future whose deadline has passed, unless its response just arrived"""
+        with self.lock:
+            expired = self._pending_results.get(future.msgid) is future
+
+            if expired:
+                del self._pending_results[future.msgid]
+
+        if expired:
+            self._release_slot()
+            future.set_result(TimeoutError("Deadline exceeded"), None)
+        else:
+            future._done.wait()
+
+    def window_stats(self):
+        """Occupancy of the in-flight window"""
+        with self.lock:
+            return dict(
+                max_in_flight=self.max_in_flight,
+                in_flight=len(self._pending_results),
+                peak_in_flight=self.peak_in_flight,
+                blocked=self.blocked,
+                blocked_time=self.blocked_time,
+            )
+
+    def enable_cache(self, size=1024):
+        """Cache the results of the cacheable methods of the server,
+        returns the :class:`~msgpackio.cache.ClientCache` or None if it has none"""
+        try:
+            methods = self.call(FUNCNAME_CACHEABLE)
+        except RemoteException:
+            # the server does not support caching
+            methods = dict()
+
+        self.cache = None
+        if methods:
+            self.cache = ClientCache(methods, size)
+
+        return self.cache
+
+    def call(self, method, *args, timeout=None):
+        if self.cache is not None and method in self.cache.methods:
+            return self._call_cached(method, args, timeout)
+
+        result = self.send_request(method, args, timeout).get()
+        return result
+
+    def _call_cached(self, method, args, timeout):
+        """Returns the cached result, or joins the identical call in flight"""
+        cache = self.cache
+        key = call_key(method, args)
+
+        with cache.lock:
+            found, result = cache.get(key, time.monotonic())
+            if found:
+                return result
+
+            shared = cache.pending.get(key)
+            owner = shared is None
+
+            if owner:
+                cache.pending[key] = shared = concurrent.futures.Future()
+                epoch = cache.epoch
+            else:
+                cache.collapsed += 1
+
+        if not owner:
+            return shared.result(timeout)
+
+        try:
+            result = self.send_request(method, args, timeout).get()
+            cache.put(key, method, result, epoch, time.monotonic())
+            shared.set_result(result)
+            return result
+
+        except BaseException as err:
+            shared.set_exception(err)
+            raise
+
+        finally:
+            with cache.lock:
+                del cache.pending[key]
+
+    def call_async(self, method, *args, timeout=None):
+        return self.send_request(method, args, timeout)
+
+    @staticmethod
+    def _request(msgid, method, args, timeout):
+        if timeout is None:
+            return (REQUEST, msgid, method, args)
+
+        return (REQUEST, msgid, method, args, timeout)
+
+    def send_request(self, method, args, timeout=None):
+        # the slot is reserved before taking the write lock, the responses, credits
+        # and notifications sent while the window is full would wait behind it
+        self._evict_expired()
+        self._acquire_slot()
+
+        future = self._add_pending(timeout)
+        msg = self._request(future.msgid, method, args, timeout)
+
+        with self.write_lock:
+            if self.tracer is None:
+                self.client.send(msg)
+            else:
+                self._send_traced([msg], [future])
+
+        return future
+
+    def send_requests(self, calls, timeout=None):
+        """Send multiple requests in a single write, returns their futures
+
+        Parameters
+        ----------
+        calls: List[Tuple[str, tuple]]
+            List of ``(method, args)``
+
+        timeout: float
+            Time after which the requests expire
+
+        """
+        futures = []
+        msgs = []
+
+        self._evict_expired()
+
+        for method, args in calls:
+            if not self._acquire_slot(blocking=False):
+                # the window is full, send the requests gathered so far
+                # so their responses can free it
+                if msgs:
+                    self._send_many(msgs, futures[-len(msgs) :])
+                    msgs = []
+
+                self._acquire_slot()
+
+            future = self._add_pending(timeout)
+            futures.append(future)
+            msgs.append(self._request(future.msgid, method, args, timeout))
+
+        if msgs:
+            self._send_many(msgs, futures[-len(msgs) :])
+
+        return futures
+
+    def _send_many(self, msgs, futures):
+        with self.write_lock:
+            if self.tracer is None:
+                self.client.send_many(msgs)
+            else:
+                self._send_traced(msgs, futures)
+
+    def _send_traced(self, msgs, futures):
+        """Send messages, reporting the pack and send phases to the tracer"""
+        tracer = self.tracer
+        packer = self.client.packer
+        compressor = self.client.compressor
+        data = []
+
+        for msg, future in zip(msgs, futures):
+            start = time.monotonic()
+            packed = packer.pack(msg)
+            if compressor is not None:
+                packed = compressor.compress(packed)
+            data.append(packed)
+            tracer.on_phase("pack", future.msgid, start, time.monotonic())
+
+        start = time.monotonic()
+        self.client._write(b"".join(data))
+        end = time.monotonic()
+
+        for future in futures:
+            # the response could have been handled already, the wait is then not traced
+            future.sent_at = end
+            tracer.on_phase("send", future.msgid, start, end)
+
+    def call_many(self, calls, timeout=None, return_exceptions=False):
+        """Pipeline multiple calls, returns their results in order
+
+        Parameters
+        ----------
+        calls: List[Tuple[str, tuple]]
+            List of ``(method, args)``
+
+        timeout: float
+            Maximum time to wait for all the results, the requests expire after it
+
+        return_exceptions: bool
+            If true, failed calls return their exception instead of raising it
+
+        """
+        futures = self.send_requests(calls, timeout)
+        deadline = None
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+
+        results = []
+        for future in futures:
+            if deadline is not None:
+                timeout = max(deadline - time.monotonic(), 0)
+
+            try:
+                results.append(future.get(timeout))
+            except TimeoutError:
+                raise
+            except Exception as err:
+                if not return_exceptions:
+                    raise
+
+                results.append(err)
+
+        return results
+
+    def call_stream(self, method, *args, window=16):
+        """Call a generator binding, returns an iterator over the items it yields
+
+        Parameters
+        ----------
+        window: int
+            Number of chunks the client can buffer, on top of the server's window
+
+        Examples
+        --------
+
+        .. code-block:: python
+
+           with client.call_stream("rows", "SELECT * FROM table") as rows:
+               for row in rows:
+                   print(row)
+
+        """
+        self._evict_expired()
+        self._acquire_slot()
+
+        stream = self._add_pending(window=window)
+
+        # the window is sent along with the request, after the timeout
+        with self.write_lock:
+            self.client.send((REQUEST, stream.future.msgid, method, args, None, window))
+
+        return stream
+
+    def _grant(self, msgid, n):
+        """Allow the server to send ``n`` more chunks, cancel the stream if negative"""
+        try:
+            with self.write_lock:
+                self.client.send((CREDIT, msgid, n))
+        except OSError:
+            # the connection is lost, the stream ends with a LostFuture
+            pass
+
+    def _on_message(self, value):
+        """Handle the messages of the server that are not responses"""
+        if value[0] == CHUNK:
+            self._on_chunk(value)
+
+        elif value[0] == REQUEST and len(value) == 4:
+            self._on_request(value[1], value[2], value[3])
+
+        elif value[0] == NOTIFY and len(value) == 3:
+            self._on_notify(value[1], value[2])
+
+        else:
+            log.error("%s is not supported for client", value[0])
+
+    def _binding(self, method):
+        """Returns the function of the bindings named ``method`` or None"""
+        if self.bindings is None or not isinstance(method, str):
+            return None
+
+        if method.startswith("_"):
+            return None
+
+        function = getattr(self.bindings, method, None)
+        if not callable(function):
+            return None
+
+        return function
+
+    def _on_request(self, msgid, method, params):
+        """Run a request of the server and send back the response"""
+        function = self._binding(method)
+        result = None
+        error = None
+
+        if function is None:
+            error = NoMethod(f"`{method}` is not available")
+        else:
+            try:
+                result = function(*params)
+            except Exception as err:
+                error = RemoteException(f"{type(err).__name__}: {err}")
+
+        try:
+            with self.write_lock:
+                self.client.send((RESPONSE, msgid, error, result))
+        except OSError:
+            # the server will fail its call with the connection
+            pass
+
+    def _on_notify(self, method, params):
+        function = self._notify_handlers.get(method) or self._binding(method)
+
+        if function is None:
+            log.debug("Discarding the notification %s", method)
+            return
+
+        try:
+            function(*params)
+        except Exception:
+            log.exception("Notification %s failed", method)
+
+    def subscribe(self, topic, callback):
+        """Call ``callback(message)`` with the messages published on ``topic``,
+        it runs on the thread receiving the responses so it must not block"""
+        self._topics.setdefault(topic, []).append(callback)
+        return self.call(RPCClient.FUNCNAME_SUBSCRIBE, topic)
+
+    def unsubscribe(self, topic):
+        self._topics.pop(topic, None)
+        return self.call(RPCClient.FUNCNAME_UNSUBSCRIBE, topic)
+
+    def publish(self, topic, message):
+        """Publish ``message`` on ``topic``, returns the number of subscribers"""
+        return self.call(RPCClient.FUNCNAME_PUBLISH, topic, message)
+
+    def _on_published(self, topic, message):
+        for callback in self._topics.get(topic, ()):
+            try:
+                callback(message)
+            except Exception:
+                log.exception("Subscriber of %s failed", topic)
+
+    def _invalidate(self, method=None):
+        if self.cache is not None:
+            self.cache.invalidate(method)
+
+    def _on_chunk(self, value):
+        stream = self._streams.get(value[1])
+
+        if stream is not None:
+            stream.put(value[2])
+
     def notify(self, method, *args):
-        self.client.send([NOTIFY, method, args])
+        with self.write_lock:
+            self.client.send((NOTIFY, method, args))
 
     def close(self):
         self.keep_promises = False
         self.client.close()
+        self.promise_keeper.join()
 
     def __enter__(self):
         return self
@@ -86,27 +671,51 @@ class RPCClient:
         self.close()
         return
 
-    def _set_future(self, value):
+    def _set_future(self, value, decoded_at=None):
         _, msgid, error, result = value
 
         with self.lock:
             future = self._pending_results.pop(msgid, None)
 
         if future is None:
-            log.error(f"Server replied to an unknown future")
+            # the request expired or the connection was reset
+            log.debug(f"Discarding the response of an unknown request")
+            return msgid
+
+        if decoded_at is not None:
+            read_at = self.client.read_at
+            future.decoded_at = decoded_at
+            self.tracer.on_phase("wait", msgid, future.sent_at, read_at)
+            self.tracer.on_phase("unpack", msgid, read_at, decoded_at)
+
+        self._release_slot()
+        future.set_result(error, result)
+
+        if self._streams:
+            stream = self._streams.pop(msgid, None)
+
+            if stream is not None:
+                stream.end()
 
-        future.error = error
-        future.result = result
         return msgid
 
     def _wait_future(self, timeout, target):
-        start = time.time()
+        expires = False
+
+        if target.deadline is not None:
+            remaining = max(target.deadline - time.monotonic(), 0)
+
+            if timeout is None or remaining <= timeout:
+                timeout, expires = remaining, True
 
-        while not target.ready():
-            time.sleep(0)
+        if target._done.wait(timeout):
+            if self.tracer is not None:
+                end = time.monotonic()
+                self.tracer.on_phase("wakeup", target.msgid, target.decoded_at, end)
+            return
 
-            if timeout:
-                timeout -= time.time() - start
+        if not expires:
+            raise TimeoutError()
 
-                if timeout < 0:
-                    raise TimeoutError()
+        # the result is now a TimeoutError, unless the response arrived in between
+        self._expire(target)
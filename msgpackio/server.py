@@ -1,41 +1,498 @@
 import asyncio
-import msgpack
+import inspect
 import logging
+import time
+import weakref
 
-from msgpackio.rpc import REQUEST, NOTIFY, RESPONSE
+from msgpackio.cache import (
+    FUNCNAME_CACHEABLE,
+    FUNCNAME_INVALIDATE,
+    ResponseCache,
+    request_key,
+)
+from msgpackio.compression import (
+    FUNCNAME_NEGOTIATE,
+    Compressed,
+    Compressor,
+    Decompressor,
+    negotiate,
+)
+from msgpackio.rpc import CHUNK, CREDIT, REQUEST, NOTIFY, RESPONSE, LostFuture, _seq
 from msgpackio.exceptions import RemoteException, NoMethod
+from msgpackio.ext import registry
+from msgpackio.metrics import MethodMetrics, ServerMetrics
+from msgpackio.pubsub import (
+    FUNCNAME_PUBLISH,
+    FUNCNAME_SUBSCRIBE,
+    FUNCNAME_UNSUBSCRIBE,
+    Topics,
+)
 
 log = logging.getLogger(__name__)
+# wire level messages of the servers created with trace=True
+trace_log = logging.getLogger(__name__ + ".trace")
+
+_KINDS = {REQUEST: "request", RESPONSE: "response", NOTIFY: "notify"}
+# msgpack encoding of the header of ``[RESPONSE, ...]``
+_RESPONSE_HEADER = bytes([0x94, RESPONSE])
+
+
+def _describe(value):
+    if isinstance(value, (bytes, bytearray, memoryview, str, list, tuple, dict)):
+        return f"{type(value).__name__}[{len(value)}]"
+
+    return type(value).__name__
+
+
+def _describe_params(params):
+    if isinstance(params, (list, tuple)):
+        return [_describe(p) for p in params]
+
+    return _describe(params)
+
+
+class MessageSummary:
+    """Summary of a message for the trace log, it is only formatted if the record is emitted
+
+    Handlers can read its :meth:`fields` from ``record.args[0]`` for structured logging.
+    """
+
+    __slots__ = ("direction", "msg", "size")
+
+    def __init__(self, direction, msg, size):
+        self.direction = direction
+        self.msg = msg
+        self.size = size
+
+    def fields(self):
+        msg = self.msg
+        fields = dict(direction=self.direction, kind=None, size=self.size)
+
+        # the message is traced before being validated
+        if not isinstance(msg, (list, tuple)) or len(msg) < 3:
+            return fields
+
+        fields["kind"] = _KINDS.get(msg[0])
+
+        if msg[0] == NOTIFY:
+            fields.update(method=msg[1], params=_describe_params(msg[2]))
+        elif msg[0] == REQUEST and len(msg) > 3:
+            fields.update(msgid=msg[1], method=msg[2], params=_describe_params(msg[3]))
+        elif msg[0] == RESPONSE and len(msg) > 3:
+            fields.update(msgid=msg[1], error=msg[2], result=_describe(msg[3]))
+
+        return fields
+
+    def __str__(self):
+        return " ".join(f"{k}={v}" for k, v in self.fields().items())
+
+
+class BindingOptions:
+    """Execution options of a binding, see :func:`binding`"""
+
+    def __init__(
+        self, executor=None, concurrency=None, cache=None, ttl=None, peer=False
+    ):
+        self.executor = executor
+        self.concurrency = concurrency
+        self.cache = cache
+        self.ttl = ttl
+        self.peer = peer
+        self._semaphore = None
+
+    @property
+    def semaphore(self):
+        # created lazily so it belongs to the loop of the server process
+        if self._semaphore is None and self.concurrency is not None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        return self._semaphore
+
+
+def binding(executor=None, concurrency=None, cache=None, ttl=None, peer=False):
+    """Decorator setting the execution options of a binding
+
+    Parameters
+    ----------
+    executor: None, True or Executor
+        None runs the binding on the event loop,
+        True runs it on the server executor,
+        an ``Executor`` runs it on that executor
+
+    concurrency: int
+        Maximum number of concurrent executions of the binding
+
+    cache: int
+        Cache up to ``cache`` results of the binding, it must only depend on its
+        arguments, see :mod:`msgpackio.cache`
+
+    ttl: float
+        Seconds a cached result is kept, forever if None
+
+    peer: bool
+        Pass the connection, the :class:`RPCServer`, as first argument so the binding
+        can call or notify the client, see :meth:`RPCServer.call`
+
+    Examples
+    --------
+
+    .. code-block:: python
+
+       class Bindings:
+           @binding(executor=True, concurrency=4)
+           def slow(self, x):
+               time.sleep(1)
+               return x
+
+           @binding(peer=True)
+           async def subscribe(self, peer, topic):
+               await peer.call("on_event", topic, "subscribed")
+
+    """
+
+    def wrapper(function):
+        function.binding_options = BindingOptions(
+            executor, concurrency, cache, ttl, peer
+        )
+        return function
+
+    return wrapper
+
+
+def is_scheduled(function):
+    """Returns true if the function does not run synchronously on the loop"""
+    options = getattr(function, "binding_options", None)
+
+    return (
+        asyncio.iscoroutinefunction(function)
+        or is_streaming(function)
+        or (
+            options is not None
+            and (
+                options.executor is not None
+                or options.concurrency is not None
+                or options.peer
+            )
+        )
+    )
+
+
+def is_streaming(function):
+    """Returns true if the function is a generator whose items are streamed"""
+    return inspect.isgeneratorfunction(function) or inspect.isasyncgenfunction(function)
+
+
+class StreamCredits:
+    """Number of chunks the client of a stream is ready to receive"""
+
+    def __init__(self, credits):
+        self.credits = credits
+        self.cancelled = False
+        self.event = asyncio.Event()
+
+    def grant(self, n):
+        if n < 0:
+            self.cancelled = True
+        else:
+            self.credits += n
+
+        self.event.set()
+
+    async def acquire(self):
+        """Wait for a credit, returns False if the stream was cancelled"""
+        while self.credits <= 0 and not self.cancelled:
+            self.event.clear()
+            await self.event.wait()
+
+        self.credits -= 1
+        return not self.cancelled
 
 
 class Bindings:
-    def __init__(self, obj, kwargs):
+    """Dispatch table of the methods exposed by the server
+
+    The public methods of ``obj`` and the functions of ``kwargs`` are resolved once,
+    they are indexed by both their ``str`` and ``bytes`` names.
+    Attributes starting with ``_`` are never exposed.
+
+    ``ping``, ``list_functions``, ``__stats__``, ``__invalidate__`` and ``__publish__``
+    are provided unless they are overridden, ``__stats__`` returns a snapshot of the
+    :class:`~msgpackio.metrics.ServerMetrics`, ``__invalidate__`` drops cached results,
+    ``__publish__`` publishes a message on a topic of :attr:`topics`.
+    """
+
+    FUNCNAME_LIST_FUNCTIONS = "list_functions"
+    FUNCNAME_PING = "ping"
+    FUNCNAME_STATS = "__stats__"
+    FUNCNAME_INVALIDATE = FUNCNAME_INVALIDATE
+    FUNCNAME_PUBLISH = FUNCNAME_PUBLISH
+
+    def __init__(self, obj, kwargs, topics=None):
         self.obj = obj
         self.dict = kwargs
+        # name => (function, is_scheduled, MethodMetrics, is_streaming, ResponseCache)
+        self.handlers = dict()
+        self.names = []
+        self.metrics = ServerMetrics()
+        # name => ResponseCache of the bindings marked with binding(cache=...)
+        self.caches = dict()
+        # connections whose client caches the results too
+        self.subscribers = weakref.WeakSet()
+        # publish/subscribe topics of the connections
+        self.topics = topics if topics is not None else Topics()
+
+        self[Bindings.FUNCNAME_PING] = self.ping
+        self[Bindings.FUNCNAME_LIST_FUNCTIONS] = self.list_functions
+        self[Bindings.FUNCNAME_STATS] = self.stats
+        self[Bindings.FUNCNAME_INVALIDATE] = self.invalidate
+        self[Bindings.FUNCNAME_PUBLISH] = self.topics.publish
+
+        if obj is not None:
+            for name in dir(obj):
+                if name.startswith("_"):
+                    continue
+
+                function = getattr(obj, name)
+                if callable(function):
+                    self[name] = function
+
+        for name, function in kwargs.items():
+            self[name] = function
+
+    def ping(self):
+        return True
+
+    def list_functions(self):
+        return list(self.names)
+
+    def stats(self):
+        snapshot = self.metrics.snapshot()
+        snapshot["topics"] = self.topics.stats()
+        return snapshot
+
+    def invalidate(self, method=None):
+        """Drop the cached results of ``method`` or of all the methods,
+        returns the number of entries dropped
+
+        The clients caching the results are notified.
+        """
+        for protocol in list(self.subscribers):
+            protocol.send_notify(FUNCNAME_INVALIDATE, [method])
+
+        if method is None:
+            return sum(cache.invalidate() for cache in self.caches.values())
+
+        cache = self.caches.get(method)
+        if cache is None:
+            return 0
+
+        return cache.invalidate()
+
+    def cacheable(self):
+        """Returns ``{method: ttl}`` of the bindings whose results are cached"""
+        return {name: cache.ttl for name, cache in self.caches.items()}
+
+    def handler(self, item):
+        """Returns ``(function, is_scheduled, metrics, is_streaming, cache)`` or None"""
+        return self.handlers.get(item)
 
     def get(self, item, default=None):
+        handler = self.handlers.get(item)
+
+        if handler is None:
+            return default
+
+        return handler[0]
+
+    def __setitem__(self, item, value):
         if isinstance(item, bytes):
             item = item.decode("utf-8")
 
-        if hasattr(self.obj, item):
-            return getattr(self.obj, item)
+        # __stats__ is callable but not listed
+        if item not in self.handlers and not item.startswith("_"):
+            self.names.append(item)
 
-        return self.dict.get(item, default)
+        metrics = self.metrics.method(item)
+        options = getattr(value, "binding_options", None)
 
-    def __setitem__(self, item, value):
-        self.dict[item] = value
+        # the results of a generator are not known when it is called
+        cache = None
+        if options is not None and options.cache and not is_streaming(value):
+            cache = ResponseCache(options.cache, options.ttl)
+            self.caches[item] = cache
+
+        metrics.cache = cache
+        handler = (value, is_scheduled(value), metrics, is_streaming(value), cache)
+        self.handlers[item] = handler
+        self.handlers[item.encode("utf-8")] = handler
 
 
 class RPCServer(asyncio.Protocol):
-    def __init__(self, bindings=None, **kwargs):
-        self.unpacker = msgpack.Unpacker()
-        self.packer = msgpack.Packer(default=lambda x: x.to_msgpack())
-        self.count = 0
+    """msgpack-rpc server protocol
+
+    Parameters
+    ----------
+    bindings: object or Bindings
+        Object whose public methods are exposed, a :class:`Bindings` can be shared
+        between connections to avoid resolving the methods for each of them
+
+    executor: Executor
+        Executor used by the bindings marked with ``binding(executor=True)``,
+        defaults to the loop's default executor
+
+    flush_size: int
+        Buffered responses are written as soon as they reach this size in bytes
+
+    flush_delay: float
+        Time responses produced outside of ``data_received`` can wait in the buffer
+
+    write_limit: int
+        High-water mark of the transport write buffer, reading from the client
+        is paused while it is exceeded
+
+    use_list: bool
+        If false, msgpack arrays are decoded as tuples which is slightly faster,
+        the bindings then receive tuples instead of lists
+
+    trace: bool
+        Log a :class:`MessageSummary` of the messages received and of the responses
+        sent on the ``msgpackio.server.trace`` logger at the debug level
+
+    trace_every: int
+        Only trace one received message in ``trace_every``, and its response
+
+    stream_window: int
+        Number of chunks a streamed response can send before the client grants
+        more credits, on top of the credits the client sends with its request
+
+    compression: bool
+        Accept the compression codecs proposed by the clients,
+        see :mod:`msgpackio.compression`
+
+    metrics: bool
+        Time the requests into the histograms of the method metrics,
+        the counters are kept either way
+
+    kwargs:
+        Functions exposed as methods
+
+    Notes
+    -----
+    ``async def`` bindings and bindings running on an executor are scheduled as tasks,
+    their responses are sent when they complete, possibly out of order.
+
+    Responses produced while handling a chunk of data are coalesced
+    and written once at the end of the chunk.
+
+    The clock is read once per request run on the loop: its handler time starts
+    when the previous request of the chunk completed, decoding included.
+
+    Requests can carry a timeout as a fifth element, they are dropped without
+    a response if it expires before they are dispatched or, for scheduled bindings,
+    before they complete.
+
+    The items of generator and async generator bindings are streamed to the requests
+    carrying a window of credits as a sixth element, after the timeout or None,
+    as ``[CHUNK, msgid, item]`` messages followed by a ``RESPONSE`` with a None result,
+    the client grants credits with ``[CREDIT, msgid, n]`` as it consumes them.
+    Other requests receive the list of the items. Generators run on the loop,
+    they should not block.
+
+    The connection is bidirectional: :meth:`call` and :meth:`notify` send requests
+    to the client, which answers them with its own bindings,
+    see :class:`~msgpackio.rpc.RPCClient`.
+
+    """
+
+    def __init__(
+        self,
+        bindings=None,
+        executor=None,
+        flush_size=65536,
+        flush_delay=0,
+        write_limit=None,
+        use_list=True,
+        trace=False,
+        trace_every=1,
+        stream_window=16,
+        compression=True,
+        metrics=True,
+        **kwargs,
+    ):
+        self.unpacker = registry.unpacker(use_list=use_list)
+        self.packer = registry.packer()
         self.message_kinds = {
             REQUEST: self.on_request,
             NOTIFY: self.on_notify,
+            CREDIT: self.on_credit,
+            RESPONSE: self.on_response,
         }
-        self.bindings = Bindings(bindings, kwargs)
+        if isinstance(bindings, Bindings):
+            self.bindings = bindings
+            for name, function in kwargs.items():
+                self.bindings[name] = function
+        else:
+            self.bindings = Bindings(bindings, kwargs)
+
+        # name => (function, scheduled, metrics, streaming, cache), looked up per request
+        self.handlers = self.bindings.handlers
+        self.metrics = self.bindings.metrics
+        self.executor = executor
+        self.tasks = set()
+
+        self.stream_window = stream_window
+        # msgid => StreamCredits of the streamed responses
+        self.streams = dict()
+
+        # requests sent to the client, msgid => asyncio.Future
+        self.generator = _seq()
+        self.pending = dict()
+
+        self.compression = compression
+        self.compressor = None
+        # compressed requests are rejected until a codec is negotiated
+        self.decompressor = None
+        self.use_list = use_list
+        # methods acting on the connection, looked up after the bindings
+        self.connection_methods = dict()
+        for name, function in [
+            (FUNCNAME_NEGOTIATE, self.negotiate_compression),
+            (FUNCNAME_CACHEABLE, self.subscribe_invalidations),
+            (FUNCNAME_SUBSCRIBE, self.subscribe),
+            (FUNCNAME_UNSUBSCRIBE, self.unsubscribe),
+        ]:
+            self.connection_methods[name] = function
+            self.connection_methods[name.encode("utf-8")] = function
+
+        self.flush_size = flush_size
+        self.flush_delay = flush_delay
+        self.write_limit = write_limit
+        self.batching = False
+        self.flush_handle = None
+        self.wbuffer = []
+        self.wsize = 0
+        self.writing_paused = False
+
+        # time.monotonic() at which the current chunk of data was received
+        self.received_at = 0
+        # time.monotonic() at which the last timed request completed
+        self.clock = 0
+        self.timed = metrics
+        # size in bytes of the message being dispatched
+        self.message_size = 0
+        # chunk of data being dispatched & number of bytes received before it
+        self.data = b""
+        self.data_start = 0
+        self.received = 0
+        # offset of the end of the last message decoded
+        self.boundary = 0
+        self.expired = 0
+
+        self.trace = trace
+        self.trace_every = trace_every
+        self.trace_countdown = 0
+        # msgid of the traced requests waiting for their response
+        self.traced = set()
 
     def add_bindings(self, name, function):
         self.bindings[name] = function
@@ -44,47 +501,620 @@ class RPCServer(asyncio.Protocol):
         log.debug("Server: A connection was made")
         self.transport = transport
 
+        if self.write_limit is not None:
+            transport.set_write_buffer_limits(high=self.write_limit)
+
     def data_received(self, data):
-        log.debug(f"Server: Receiving data {data}")
+        unpacker = self.unpacker
+        unpacker.feed(data)
+        self.received_at = self.clock = time.monotonic()
+        self.data = data
+        self.data_start = self.received
+        self.received += len(data)
+        self.batching = True
+
+        # tell() moves forward on a partial message, start from the last complete one
+        offset = self.boundary
+
+        try:
+            for message in unpacker:
+                position = unpacker.tell()
+                self.message_size = position - offset
+                offset = position
+
+                if message.__class__ is Compressed:
+                    message = self.decompress(message)
 
-        self.unpacker.feed(data)
-        for message in self.unpacker:
-            self.on_message(message)
+                    if message is None:
+                        return
+
+                if self.trace:
+                    self.trace_received(message)
+
+                clock = self.clock
+                self.on_message(message)
+
+                # only the timed requests advance the clock past their handler
+                if self.timed and self.clock == clock:
+                    self.clock = time.monotonic()
+        finally:
+            self.boundary = offset
+            self.batching = False
+            self.flush()
 
     def connection_lost(self, exc):
         log.debug("Server: The connection was lost")
 
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+
+        # nobody is left to grant credits
+        for credits in self.streams.values():
+            credits.grant(-1)
+
+        self.bindings.subscribers.discard(self)
+        self.bindings.topics.unsubscribe(self)
+
+        pending = self.pending
+        self.pending = dict()
+
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(LostFuture("Connection lost"))
+
+    def pause_writing(self):
+        # the client is not reading its responses, stop reading its requests
+        log.debug("Server: Write buffer is full, pause reading")
+        self.writing_paused = True
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        log.debug("Server: Write buffer drained, resume reading")
+        self.writing_paused = False
+        self.transport.resume_reading()
+
+        # messages published while the client was not reading
+        subscriber = self.bindings.topics.subscribers.get(self)
+        if subscriber is not None:
+            subscriber.drain()
+
     def on_message(self, msg):
         n = len(msg)
-        if n != 3 and n != 4:
-            log.error(f"Wrong RPC format {msg}")
+
+        # fast path for plain requests
+        if n == 4 and msg[0] == REQUEST:
+            return self.on_request(msg[1], msg[2], msg[3])
+
+        if n < 3 or n > 6:
+            log.error("Wrong RPC format, message of %d elements", n)
             return
 
         handler = self.message_kinds.get(msg[0], None)
 
         if handler is None:
-            log.error(f"{msg[0]} is not supported for server")
+            log.error("%s is not supported for server", msg[0])
             return
 
         return handler(*msg[1:])
 
-    def on_request(self, msgid, method, params):
-        function = self.bindings.get(method, None)
+    def on_request(self, msgid, method, params, timeout=None, window=None):
+        handler = self.handlers.get(method)
+
+        if handler is None:
+            return self.on_connection_request(msgid, method, params)
+
+        function, scheduled, metrics, streaming, cache = handler
+        metrics.bytes_in += self.message_size
+
+        deadline = None
+        if timeout is not None:
+            deadline = self.received_at + timeout
+
+            if time.monotonic() >= deadline:
+                self.on_expired(msgid, method, metrics)
+                return
+
+        key = None
+        if cache is not None:
+            key = self.cache_key()
+
+            if key is not None and self.on_cached_request(msgid, cache, key, metrics):
+                return
+
+        if scheduled:
+            metrics.in_flight += 1
+
+            # the client asked for a stream
+            if streaming and window is not None:
+                self.streams[msgid] = StreamCredits(self.stream_window + window)
+
+            self.schedule(
+                self.run_request(
+                    msgid, function, params, deadline, method, metrics, cache, key
+                )
+            )
+            return
+
         result = None
         error = None
+        start = self.clock
+
+        try:
+            result = function(*params)
+        except Exception as err:
+            metrics.errors += 1
+            error = RemoteException(f"{type(err).__name__}: {err}")
+
+        if self.timed:
+            self.clock = end = time.monotonic()
+            samples = metrics.samples
+            samples.append(start - self.received_at)
+            samples.append(end - start)
+            if len(samples) >= MethodMetrics.FOLD_SIZE:
+                metrics.fold()
+        else:
+            metrics.untimed += 1
+
+        if key is not None and error is None:
+            body = self.packer.pack(result)
+            cache.put(key, body, self.received_at)
+            metrics.bytes_out += self.send_packed_response(msgid, body)
+            return
+
+        metrics.bytes_out += self.send_response(msgid, error, result)
+
+    def cache_key(self):
+        """Returns the packed method & params of the request being dispatched,
+        None if it was not received in a single chunk"""
+        end = self.unpacker.tell() - self.data_start
+        return request_key(self.data, end - self.message_size, end)
+
+    def on_cached_request(self, msgid, cache, key, metrics):
+        """Send the cached result of the request, returns False on a miss"""
+        start = self.clock
+        body = cache.get(key, start)
+
+        if body is None:
+            return False
+
+        if self.timed:
+            self.clock = end = time.monotonic()
+            samples = metrics.samples
+            samples.append(start - self.received_at)
+            samples.append(end - start)
+            if len(samples) >= MethodMetrics.FOLD_SIZE:
+                metrics.fold()
+        else:
+            metrics.untimed += 1
+
+        metrics.bytes_out += self.send_packed_response(msgid, body)
+        return True
+
+    def on_connection_request(self, msgid, method, params):
+        function = self.connection_methods.get(method)
 
         if function is None:
+            self.metrics.unknown += 1
             error = NoMethod(f"`{method}` is not available")
-        else:
+            self.send_response(msgid, error, None)
+            return
+
+        result = None
+        error = None
+
+        try:
             result = function(*params)
+        except Exception as err:
+            error = RemoteException(f"{type(err).__name__}: {err}")
+
+        self.send_response(msgid, error, result)
+
+    def negotiate_compression(self, codecs, threshold):
+        """Compress the messages larger than ``threshold`` with the first codec
+        of ``codecs`` that is available, returns its name or None"""
+        codec = None
+        if self.compression:
+            codec = negotiate(codecs)
+
+        if codec is None:
+            self.compressor = None
+            self.decompressor = None
+            return None
+
+        self.compressor = Compressor(codec, threshold)
+        self.decompressor = Decompressor([codec], use_list=self.use_list)
+        return codec.name
 
-        self.transport.write(self.packer.pack([RESPONSE, msgid, error, result]))
+    def decompress(self, compressed):
+        """Returns the decompressed message, or None after closing the connection
+        if it did not negotiate its codec or the message is too large"""
+        try:
+            if self.decompressor is None:
+                raise ValueError("no codec was negotiated")
+
+            return self.decompressor.decompress(compressed)
+
+        except ValueError as err:
+            log.error("Server: Rejected a compressed message, %s", err)
+            self.transport.abort()
+            return None
+
+    def subscribe(self, topic):
+        """Receive the messages published on ``topic``"""
+        self.bindings.topics.subscribe(self, topic)
+        return True
+
+    def unsubscribe(self, topic=None):
+        """Stop receiving the messages of ``topic``, or of all the topics if None"""
+        self.bindings.topics.unsubscribe(self, topic)
+        return True
+
+    def subscribe_invalidations(self):
+        """Returns ``{method: ttl}`` of the cacheable methods,
+        the client is then notified when their results are invalidated"""
+        self.bindings.subscribers.add(self)
+        return self.bindings.cacheable()
 
     def on_notify(self, method, params):
-        method = self.bindings.get(method)
+        handler = self.handlers.get(method)
 
-        if method is None:
-            log.error(f"{method} is not a method")
+        if handler is None:
+            self.metrics.unknown += 1
+            log.error("%s is not a method", method)
+            return
+
+        function, scheduled, metrics, _, _ = handler
+        metrics.notifications += 1
+        metrics.bytes_in += self.message_size
+
+        if scheduled:
+            self.schedule(self.run_notify(function, params, metrics))
+            return
+
+        function(*params)
+
+    def send_response(self, msgid, error, result):
+        """Returns the size of the response in bytes"""
+        if self.transport.is_closing():
+            log.debug("Server: Connection closed before the response was sent")
+            return 0
+
+        response = (RESPONSE, msgid, error, result)
+        data = self.packer.pack(response)
+
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+
+        self.write(data)
+
+        if self.trace and msgid in self.traced:
+            self.traced.discard(msgid)
+            trace_log.debug("%s", MessageSummary("send", response, len(data)))
+
+        return len(data)
+
+    def call(self, method, *args, timeout=None):
+        """Call a method of the client, returns a future resolved with its result
+
+        Examples
+        --------
+
+        .. code-block:: python
+
+           result = await server.call("on_event", "topic", data)
+
+        """
+        loop = asyncio.get_running_loop()
+        msgid = next(self.generator)
+        future = loop.create_future()
+
+        if self.transport.is_closing():
+            future.set_exception(LostFuture("Connection lost"))
+            return future
+
+        self.pending[msgid] = future
+
+        if timeout is not None:
+            handle = loop.call_later(timeout, self._expire_call, msgid)
+            future.add_done_callback(lambda _: handle.cancel())
+
+        data = self.packer.pack((REQUEST, msgid, method, args))
+
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+
+        self.write(data)
+        return future
+
+    def _expire_call(self, msgid):
+        future = self.pending.pop(msgid, None)
+
+        if future is not None and not future.done():
+            future.set_exception(asyncio.TimeoutError("Deadline exceeded"))
+
+    def notify(self, method, *args):
+        """Send a notification to the client, it does not reply"""
+        self.send_notify(method, args)
+
+    def on_response(self, msgid, error, result):
+        """Response of the client to :meth:`call`"""
+        future = self.pending.pop(msgid, None)
+
+        # the call timed out or was cancelled
+        if future is None or future.done():
+            return
+
+        if error is not None:
+            future.set_exception(RemoteException.from_msgpack(error))
+        else:
+            future.set_result(result)
+
+    def send_notify(self, method, params):
+        """Send a notification to the client"""
+        if self.transport.is_closing():
+            return
+
+        data = self.packer.pack((NOTIFY, method, params))
+
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+
+        self.write(data)
+
+    def send_packed_response(self, msgid, body):
+        """Send a response whose result is already packed, returns its size in bytes"""
+        if self.transport.is_closing():
+            log.debug("Server: Connection closed before the response was sent")
+            return 0
+
+        # [RESPONSE, msgid, nil, body]
+        data = b"".join((_RESPONSE_HEADER, self.packer.pack(msgid), b"\xc0", body))
+
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+
+        self.write(data)
+
+        if self.trace and msgid in self.traced:
+            self.traced.discard(msgid)
+            response = (RESPONSE, msgid, None, body)
+            trace_log.debug("%s", MessageSummary("send", response, len(data)))
+
+        return len(data)
+
+    def trace_received(self, msg):
+        if self.trace_countdown > 0:
+            self.trace_countdown -= 1
+            return
+
+        self.trace_countdown = self.trace_every - 1
+        trace_log.debug("%s", MessageSummary("recv", msg, self.message_size))
+
+        if isinstance(msg, (list, tuple)) and len(msg) > 3 and msg[0] == REQUEST:
+            self.traced.add(msg[1])
+
+    def write(self, data):
+        """Buffer data to be sent, it is flushed at the end of the current batch"""
+        self.wbuffer.append(data)
+        self.wsize += len(data)
+
+        if self.wsize >= self.flush_size:
+            self.flush()
+
+        elif not self.batching and self.flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self.flush_handle = loop.call_later(self.flush_delay, self.flush)
+
+    def flush(self):
+        """Write the buffered responses to the transport"""
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+
+        if not self.wbuffer:
+            return
+
+        buffer = self.wbuffer
+        self.wbuffer = []
+        self.wsize = 0
+
+        if self.transport.is_closing():
+            log.debug("Server: Connection closed before the responses were sent")
+            return
+
+        self.transport.writelines(buffer)
+
+    async def run(self, function, params, metrics=None, received_at=None):
+        """Run a coroutine or executor backed binding"""
+        options = getattr(function, "binding_options", None)
+        semaphore = None
+
+        if options is not None:
+            semaphore = options.semaphore
+
+            if options.peer:
+                params = (self, *params)
+
+        if semaphore is None:
+            return await self._timed(function, params, options, metrics, received_at)
+
+        async with semaphore:
+            return await self._timed(function, params, options, metrics, received_at)
+
+    async def _timed(self, function, params, options, metrics, received_at):
+        if metrics is None:
+            return await self._run(function, params, options)
+
+        # the queue time includes the wait for the concurrency limit
+        start = time.monotonic()
+
+        try:
+            return await self._run(function, params, options)
+        finally:
+            samples = metrics.samples
+            samples.append(start - received_at)
+            samples.append(time.monotonic() - start)
+            if len(samples) >= MethodMetrics.FOLD_SIZE:
+                metrics.fold()
+
+    async def _run(self, function, params, options):
+        if asyncio.iscoroutinefunction(function):
+            return await function(*params)
+
+        if options is None or options.executor is None:
+            return function(*params)
+
+        executor = options.executor
+        if executor is True:
+            executor = self.executor
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, function, *params)
+
+    async def drain(self):
+        """Wait for the in-flight requests to complete"""
+        while self.tasks:
+            await asyncio.wait(list(self.tasks))
+
+    def schedule(self, coro):
+        # the loop only keeps weak references to its tasks
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def run_notify(self, function, params, metrics=None):
+        try:
+            await self.run(function, params)
+        except Exception:
+            if metrics is not None:
+                metrics.errors += 1
+            log.exception("Server: Notification failed")
+
+    async def run_request(
+        self,
+        msgid,
+        function,
+        params,
+        deadline=None,
+        method=None,
+        metrics=None,
+        cache=None,
+        key=None,
+    ):
+        result = None
+        error = None
+        received_at = self.received_at
+
+        try:
+            run = self.run(
+                function, params, metrics if self.timed else None, received_at
+            )
+
+            if deadline is None:
+                result = await run
+            else:
+                timeout = deadline - time.monotonic()
+                result = await asyncio.wait_for(run, timeout)
+
+            if msgid in self.streams:
+                chunks, result = result, None
+                await self.send_chunks(msgid, chunks, metrics)
+
+            elif inspect.isgenerator(result) or inspect.isasyncgen(result):
+                chunks, result = result, None
+                result = await self.collect(chunks)
+
+        except asyncio.TimeoutError as err:
+            if deadline is not None and time.monotonic() >= deadline:
+                return self.on_expired(msgid, method, metrics)
+
+            error = RemoteException(f"{type(err).__name__}: {err}")
+
+        except Exception as err:
+            error = RemoteException(f"{type(err).__name__}: {err}")
+
+        finally:
+            self.streams.pop(msgid, None)
+
+            if metrics is not None:
+                metrics.in_flight -= 1
+
+                if not self.timed:
+                    metrics.untimed += 1
+
+        if metrics is None:
+            self.send_response(msgid, error, result)
             return
 
-        method(*params)
+        if error is not None:
+            metrics.errors += 1
+
+        elif key is not None:
+            body = self.packer.pack(result)
+            cache.put(key, body, time.monotonic())
+            metrics.bytes_out += self.send_packed_response(msgid, body)
+            return
+
+        metrics.bytes_out += self.send_response(msgid, error, result)
+
+    async def send_chunks(self, msgid, chunks, metrics=None):
+        """Send the items of a generator as chunks, as long as the client has credits"""
+        credits = self.streams[msgid]
+        is_async = inspect.isasyncgen(chunks)
+
+        try:
+            while await credits.acquire():
+                try:
+                    if is_async:
+                        chunk = await chunks.__anext__()
+                    else:
+                        chunk = next(chunks)
+                except (StopIteration, StopAsyncIteration):
+                    return
+
+                size = self.send_chunk(msgid, chunk)
+                if metrics is not None:
+                    metrics.bytes_out += size
+        finally:
+            if is_async:
+                await chunks.aclose()
+            else:
+                chunks.close()
+
+    async def collect(self, chunks):
+        """Returns the items of a generator, for the requests that are not streamed"""
+        if inspect.isasyncgen(chunks):
+            return [chunk async for chunk in chunks]
+
+        return list(chunks)
+
+    def send_chunk(self, msgid, chunk):
+        """Returns the size of the chunk in bytes"""
+        if self.transport.is_closing():
+            return 0
+
+        data = self.packer.pack((CHUNK, msgid, chunk))
+
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+
+        self.write(data)
+        return len(data)
+
+    def on_credit(self, msgid, n):
+        credits = self.streams.get(msgid)
+
+        # the stream could have ended already
+        if credits is not None:
+            credits.grant(n)
+
+    def on_expired(self, msgid, method, metrics=None):
+        """The client gave up on the request, it is dropped without a response"""
+        log.debug("Server: Request %s to `%s` expired", msgid, method)
+        self.expired += 1
+        self.traced.discard(msgid)
+
+        if metrics is not None:
+            metrics.expired += 1
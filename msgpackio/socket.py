@@ -5,9 +5,11 @@ import time
 import socket
 import logging
 
-import msgpack
 import numpy as np
 
+from msgpackio.client import unix_path
+from msgpackio.ext import registry
+
 DEFAULT_PORT = 15151
 LOCALHOST = 'localhost'
 REQUEST = 0
@@ -41,16 +43,24 @@ class SocketClient:
         server_port=DEFAULT_PORT,
         timeout=20,
         reconnect_limit=1024,
+        pipeline_size=65536,
+        tracer=None,
         **kwargs,
     ):
         self.host = server_address
         self.port = server_port
-        self.packer = msgpack.Packer()
-        self.unpacker = msgpack.Unpacker()
+        self.packer = registry.packer()
+        self.unpacker = registry.unpacker()
         self.buffer = np.empty(8192, dtype="<u1")
         self.uid = 0
         self.timeout = timeout
         self.retries = reconnect_limit
+        self.pipeline_size = pipeline_size
+
+        # see msgpackio.tracing, there is no wakeup phase as the caller reads the socket
+        self.tracer = tracer
+        self.sent_at = None
+        self.read_at = None
 
     def connect(self, retries=None, timeout=None, sleep_step=1):
         if timeout is None:
@@ -61,17 +71,23 @@ class SocketClient:
 
         start = time.time()
 
+        path = unix_path(self.host)
+        if path is not None:
+            family, address = socket.AF_UNIX, path
+        else:
+            family, address = socket.AF_INET, (self.host, self.port)
+
         for i in range(retries):
-            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock = socket.socket(family, socket.SOCK_STREAM)
 
             try:
-                self.sock.connect((self.host, self.port))
+                self.sock.connect(address)
                 logger.info(
                     f"Connected after %5.2f s  and %d retries", time.time() - start, i
                 )
                 return
-            except ConnectionRefusedError:
-                pass
+            except (ConnectionRefusedError, FileNotFoundError):
+                self.sock.close()
 
             time.sleep(sleep_step)
 
@@ -107,20 +123,119 @@ class SocketClient:
 
         raise RemoteException(error)
 
+    def call_many(self, calls, return_exceptions=False):
+        """Pipeline multiple calls, returns their results in order
+
+        Parameters
+        ----------
+        calls: List[Tuple[str, tuple]]
+            List of ``(method, args)``
+
+        return_exceptions: bool
+            If true, failed calls return their exception instead of raising it
+
+        """
+        uids = []
+        payload = []
+        size = 0
+        responses = dict()
+
+        for method, args in calls:
+            start = time.monotonic() if self.tracer is not None else None
+
+            uids.append(self.uid)
+            payload.append(self.packer.pack((REQUEST, self.uid, method, args)))
+            size += len(payload[-1])
+
+            if start is not None:
+                self.tracer.on_phase("pack", self.uid, start, time.monotonic())
+
+            self.uid += 1
+
+            # read the responses before sending more, or both ends could block
+            # on a full socket buffer
+            if size >= self.pipeline_size:
+                self._pipeline(payload, uids, responses)
+                payload = []
+                size = 0
+
+        if payload:
+            self._pipeline(payload, uids, responses)
+
+        results = []
+        for uid in uids:
+            error, result = responses[uid]
+
+            if error is None:
+                results.append(result)
+            elif return_exceptions:
+                results.append(RemoteException(error))
+            else:
+                raise RemoteException(error)
+
+        return results
+
+    def _pipeline(self, payload, uids, responses):
+        start = time.monotonic()
+        self.sock.sendall(b"".join(payload))
+
+        if self.tracer is not None:
+            self.sent_at = time.monotonic()
+
+            for uid in uids[len(responses) :]:
+                self.tracer.on_phase("send", uid, start, self.sent_at)
+
+        while len(responses) < len(uids):
+            kind, msgid, error, result = self.receive_message()
+            assert kind == RESPONSE
+            responses[msgid] = (error, result)
+
     def send_message(self, method, args):
+        if self.tracer is not None:
+            return self._send_traced(method, args)
+
+        uid = self.uid
+        payload = self.packer.pack((REQUEST, uid, method, args))
+        self.sock.sendall(payload)
+        self.uid += 1
+        return uid
+
+    def _send_traced(self, method, args):
         uid = self.uid
-        payload = msgpack.packb([REQUEST, uid, method, args])
+
+        start = time.monotonic()
+        payload = self.packer.pack((REQUEST, uid, method, args))
+        packed = time.monotonic()
         self.sock.sendall(payload)
+        self.sent_at = time.monotonic()
         self.uid += 1
+
+        self.tracer.on_phase("pack", uid, start, packed)
+        self.tracer.on_phase("send", uid, packed, self.sent_at)
         return uid
 
     def receive_message(self):
         while True:
+            # return the messages already received first
+            for msg in self.unpacker:
+                if self.tracer is not None:
+                    self._trace_response(msg)
+                return msg
+
             size = self.sock.recv_into(self.buffer)
+
+            if self.tracer is not None:
+                self.read_at = time.monotonic()
+
+            if size == 0:
+                raise ConnectionResetError("Connection closed by peer")
+
             self.unpacker.feed(memoryview(self.buffer[:size]))
 
-            for msg in self.unpacker:
-                return msg
+    def _trace_response(self, msg):
+        decoded_at = time.monotonic()
+        self.tracer.on_phase("wait", msg[1], self.sent_at, self.read_at)
+        self.tracer.on_phase("unpack", msg[1], self.read_at, decoded_at)
 
     def _add_function(self, function_name):
         self.__dict__[function_name] = lambda *args: self.call(function_name, *args)
@@ -130,7 +245,10 @@ class SocketClient:
 
         function_list = self.call(SocketClient.FUNCNAME_LIST_FUNCTIONS)
 
-        for fname in map(lambda x: x.decode("utf-8"), function_list):
+        for fname in function_list:
+            if isinstance(fname, bytes):
+                fname = fname.decode("utf-8")
+
             self._add_function(fname)
 
         logger.debug("Functions bound: {}".format(function_list))
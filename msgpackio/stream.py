@@ -0,0 +1,147 @@
+"""Client side of the streamed responses
+
+A binding written as a generator, or an async generator, streams the items
+it yields when the request carries a window, as a sixth element after the
+timeout or None: the server sends one ``(CHUNK, msgid, item)`` message per item
+and the usual response once the generator is exhausted. Other requests receive
+the list of the items.
+
+The client controls the pace with ``(CREDIT, msgid, n)`` messages, the server
+sends a chunk only when it holds a credit. The server starts with
+``stream_window`` credits plus the window of the request, the client grants
+more credits as the items are consumed.
+A negative credit cancels the stream, the generator is closed on the server.
+
+"""
+
+import asyncio
+import queue
+
+_END = object()
+
+
+class Stream:
+    """Iterator over the chunks of a streamed response, see :meth:`RPCClient.call_stream`
+
+    At most ``window`` chunks, plus the server's ``stream_window``, are buffered,
+    credits are granted back to the server as the chunks are consumed.
+    """
+
+    def __init__(self, client, future, window):
+        self.client = client
+        self.future = future
+        self.msgid = future.msgid
+        self.window = window
+        self.chunks = queue.SimpleQueue()
+        self.consumed = 0
+        self.ended = False
+        self.closed = False
+
+    def put(self, chunk):
+        """Called by the reader thread when a chunk arrives"""
+        self.chunks.put(chunk)
+
+    def end(self):
+        """Called by the reader thread once the response is resolved"""
+        self.chunks.put(_END)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed:
+            raise StopIteration
+
+        if self.ended:
+            self.future.get()
+            raise StopIteration
+
+        chunk = self.chunks.get()
+
+        if chunk is _END:
+            self.ended = True
+            # raise the error of the stream, if any
+            self.future.get()
+            raise StopIteration
+
+        self.consumed += 1
+        if self.consumed >= max(self.window // 2, 1):
+            self.client._grant(self.msgid, self.consumed)
+            self.consumed = 0
+
+        return chunk
+
+    def close(self):
+        """Stop the stream, the server stops producing chunks"""
+        if not self.ended and not self.closed:
+            self.client._grant(self.msgid, -1)
+
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, a, b, c):
+        self.close()
+        return
+
+
+class AsyncStream:
+    """Async iterator over the chunks of a streamed response,
+    see :meth:`AsyncRPCClient.stream`"""
+
+    def __init__(self, client, future, msgid, window):
+        self.client = client
+        self.future = future
+        self.msgid = msgid
+        self.window = window
+        self.chunks = asyncio.Queue()
+        self.consumed = 0
+        self.ended = False
+        self.closed = False
+
+    def put(self, chunk):
+        self.chunks.put_nowait(chunk)
+
+    def end(self):
+        self.chunks.put_nowait(_END)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed:
+            raise StopAsyncIteration
+
+        if self.ended:
+            await self.future
+            raise StopAsyncIteration
+
+        chunk = await self.chunks.get()
+
+        if chunk is _END:
+            self.ended = True
+            # raise the error of the stream, if any
+            await self.future
+            raise StopAsyncIteration
+
+        self.consumed += 1
+        if self.consumed >= max(self.window // 2, 1):
+            self.client._grant(self.msgid, self.consumed)
+            self.consumed = 0
+
+        return chunk
+
+    async def aclose(self):
+        """Stop the stream, the server stops producing chunks"""
+        if not self.ended and not self.closed:
+            self.client._grant(self.msgid, -1)
+
+        self.closed = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, a, b, c):
+        await self.aclose()
+        return
@@ -0,0 +1,60 @@
+"""Client side tracing of the phases of a call
+
+A tracer is given to a client, which calls :meth:`Tracer.on_phase` with the
+``time.monotonic()`` timestamps of each phase of every call:
+
+* ``pack``: encoding the request
+* ``send``: writing the request to the socket
+* ``wait``: from the end of the write until the response bytes are read,
+  it includes the network & the server time
+* ``unpack``: from the read until the response is decoded,
+  it includes the decoding of the responses read along with it
+* ``wakeup``: from the decoded response until the caller resumes
+
+Clients without tracer only pay for a ``None`` check.
+
+Examples
+--------
+
+.. code-block:: python
+
+   tracer = TraceAggregator()
+   client = Client("localhost", 18800, tracer=tracer)
+
+   client.call("sum", 1, 2)
+   tracer.summary()  # = > {"pack": {"count": 1, "p50": ...}, "send": ...}
+
+"""
+
+import threading
+
+from msgpackio.metrics import Histogram
+
+PHASES = ("pack", "send", "wait", "unpack", "wakeup")
+
+
+class Tracer:
+    """Hook interface, it can be called from the client background threads"""
+
+    def on_phase(self, phase, msgid, start, end):
+        pass
+
+
+class TraceAggregator(Tracer):
+    """Keeps a histogram of the duration of each phase"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = {phase: Histogram() for phase in PHASES}
+
+    def on_phase(self, phase, msgid, start, end):
+        if start is None:
+            return
+
+        with self.lock:
+            self.phases[phase].record(max(end - start, 0))
+
+    def summary(self):
+        """Percentiles of the duration of each phase in seconds"""
+        with self.lock:
+            return {phase: h.summary() for phase, h in self.phases.items()}
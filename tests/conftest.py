@@ -0,0 +1,25 @@
+class Transport:
+    """Records what a protocol writes, in place of an asyncio transport"""
+
+    def __init__(self):
+        self.writes = []
+        self.reading = True
+        self.aborted = False
+
+    def is_closing(self):
+        return self.aborted
+
+    def write(self, data):
+        self.writes.append([data])
+
+    def writelines(self, data):
+        self.writes.append(list(data))
+
+    def pause_reading(self):
+        self.reading = False
+
+    def resume_reading(self):
+        self.reading = True
+
+    def abort(self):
+        self.aborted = True
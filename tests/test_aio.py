@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import multiprocessing as mp
+
+import pytest
+
+from msgpackio.aio import AsyncRPCClient
+from msgpackio.exceptions import RemoteException
+from msgpackio.server import RPCServer
+
+log = logging.getLogger(__name__)
+
+
+def add(a, b):
+    return a + b
+
+
+def server(**bindings):
+    async def main():
+        loop = asyncio.get_running_loop()
+
+        server = await loop.create_server(
+            lambda: RPCServer(**bindings), "127.0.0.1", 8888
+        )
+
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
+
+
+def test_async_client_call():
+    s = mp.Process(target=server, kwargs=dict(add=add))
+    s.start()
+
+    async def main():
+        async with await AsyncRPCClient.connect("127.0.0.1", 8888) as client:
+            assert await client.call("add", 1, 2) == 3
+
+            results = await asyncio.gather(
+                *[client.call("add", i, 1) for i in range(1000)]
+            )
+            assert results == [i + 1 for i in range(1000)]
+
+            with pytest.raises(RemoteException):
+                await client.call("missing", 1, 2)
+
+    try:
+        asyncio.run(main())
+    finally:
+        s.terminate()
+        s.join()
+
+
+async def async_sleep(duration):
+    await asyncio.sleep(duration)
+    return duration
+
+
+def test_async_client_timeout():
+    s = mp.Process(target=server, kwargs=dict(add=add, sleep=async_sleep))
+    s.start()
+
+    async def main():
+        async with await AsyncRPCClient.connect("127.0.0.1", 8888) as client:
+            with pytest.raises(asyncio.TimeoutError):
+                await client.call("sleep", 1, timeout=0.1)
+
+            assert client._pending_results == dict()
+            assert await client.call("add", 1, 2, timeout=1) == 3
+
+    try:
+        asyncio.run(main())
+    finally:
+        s.terminate()
+        s.join()
+
+
+def test_async_client_lost():
+    from msgpackio.rpc import LostFuture
+
+    s = mp.Process(target=server, kwargs=dict(add=add, sleep=async_sleep))
+    s.start()
+
+    async def main():
+        async with await AsyncRPCClient.connect("127.0.0.1", 8888) as client:
+            pending = client.call("sleep", 10)
+            s.terminate()
+
+            with pytest.raises(LostFuture):
+                await asyncio.wait_for(pending, 5)
+
+            # nothing would resolve the requests sent from now on
+            with pytest.raises(LostFuture):
+                await asyncio.wait_for(client.call("add", 1, 2), 1)
+
+            with pytest.raises(LostFuture):
+                async with client.stream("add", 1, 2) as items:
+                    await asyncio.wait_for(items.__anext__(), 1)
+
+    try:
+        asyncio.run(main())
+    finally:
+        s.terminate()
+        s.join()
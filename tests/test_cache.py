@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from msgpackio.compat import Client, Server
+from msgpackio.server import binding
+
+
+class Bindings:
+    def __init__(self):
+        self.count = 0
+
+    @binding(cache=16)
+    def lookup(self, key):
+        self.count += 1
+        return [key, self.count]
+
+    @binding(cache=16, ttl=0.1)
+    def expiring(self, key):
+        self.count += 1
+        return [key, self.count]
+
+    @binding(cache=16)
+    async def slow(self, key):
+        self.count += 1
+        await asyncio.sleep(0.2)
+        return [key, self.count]
+
+    def calls(self):
+        return self.count
+
+
+@pytest.fixture
+def server():
+    server = Server(Bindings())
+    server.listen("127.0.0.1", 8897)
+    server.start()
+
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+def test_client_cache(server):
+    with Client("127.0.0.1", 8897, cache=True) as client:
+        cache = client.client.cache
+        assert set(cache.methods) == {"lookup", "expiring", "slow"}
+
+        first = client.call("lookup", "a")
+        assert client.call("lookup", "a") == first
+        assert client.call("lookup", "b") != first
+        assert client.call("calls") == 2
+
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 2
+
+        # the entries expire after the ttl of the server
+        first = client.call("expiring", "a")
+        assert client.call("expiring", "a") == first
+        time.sleep(0.15)
+        assert client.call("expiring", "a") != first
+
+
+def test_client_cache_invalidation(server):
+    with Client("127.0.0.1", 8897, cache=True) as client:
+        first = client.call("lookup", "a")
+
+        with Client("127.0.0.1", 8897) as other:
+            assert other.call("__invalidate__", "lookup") >= 0
+
+        # the notification is received asynchronously
+        for _ in range(100):
+            if client.client.cache.stats()["invalidations"]:
+                break
+            time.sleep(0.01)
+
+        assert client.client.cache.stats()["entries"] == 0
+        assert client.call("lookup", "a") != first
+
+
+def test_client_cache_collapse(server):
+    with Client("127.0.0.1", 8897, cache=True) as client:
+        results = []
+
+        def call():
+            results.append(client.call("slow", "a"))
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        # a single request reached the server
+        assert client.call("calls") == 1
+        assert results == [results[0]] * 4
+
+        stats = client.client.cache.stats()
+        assert stats["hits"] + stats["collapsed"] == 3
+
+
+def test_client_without_cache(server):
+    with Client("127.0.0.1", 8897) as client:
+        assert client.client.cache is None
+        assert client.call("lookup", "a") == client.call("lookup", "a")
+
+        # both calls reached the server
+        stats = client.call("__stats__")["methods"]["lookup"]
+        assert stats["cache"]["hits"] == 1
@@ -1,4 +1,5 @@
 import asyncio
+import socket
 import threading
 import logging
 import multiprocessing as mp
@@ -7,6 +8,7 @@ import pytest
 import msgpack
 
 from msgpackio.client import Client
+from msgpackio.compression import MAX_SIZE
 
 
 log = logging.getLogger(__name__)
@@ -68,3 +70,62 @@ def test_client(cls):
             assert client.recv(timeout=1) == 2
     finally:
         s.terminate()
+        s.join()
+
+
+def echo_server():
+    import asyncio
+
+    class EchoProto(asyncio.Protocol):
+        def connection_made(self, transport):
+            self.transport = transport
+
+        def data_received(self, data):
+            self.transport.write(data)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+
+        server = await loop.create_server(lambda: EchoProto(), "127.0.0.1", 8888)
+
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("cls", clients)
+def test_client_recv_buffered(cls):
+    s = mp.Process(target=echo_server)
+    s.start()
+
+    try:
+        with cls("127.0.0.1", 8888) as client:
+            client.connect()
+
+            # both messages are echoed back in a single chunk
+            client.send_many([1, 2, 3])
+            assert client.recv(timeout=1) == 1
+            assert client.recv(timeout=1) == 2
+            assert list(client.recv_many(timeout=1)) == [3]
+
+            assert client.recv(timeout=0.1) is None
+            assert list(client.recv_many(timeout=0.1)) == []
+    finally:
+        s.terminate()
+        s.join()
+
+
+def test_client_recv_oversized_payload():
+    client = Client("127.0.0.1", 8888)
+    client.sock, peer = socket.socketpair()
+    client.sock.settimeout(1)
+
+    try:
+        # a response announcing a bin larger than MAX_SIZE is not preallocated
+        peer.sendall(bytes([0x94, 0x01, 0x00, 0xC0, 0xC6]) + (MAX_SIZE + 1).to_bytes(4, "big"))
+        assert list(client.recv_many(timeout=1)) == []
+        assert client.received == []
+    finally:
+        client.sock.close()
+        peer.close()
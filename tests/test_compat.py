@@ -0,0 +1,106 @@
+import asyncio
+import multiprocessing as mp
+import socket
+import threading
+import time
+
+import pytest
+
+from msgpackio.compat import Client, Server
+
+
+class Bindings:
+    def sum(self, x, y):
+        return x + y
+
+    async def slow_sum(self, x, y):
+        await asyncio.sleep(0.5)
+        return x + y
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_compat_server_workers(workers):
+    server = Server(Bindings(), workers=workers)
+    server.listen("127.0.0.1", 8889)
+    server.start()
+
+    try:
+        clients = [Client("127.0.0.1", 8889) for _ in range(4)]
+
+        for client in clients:
+            assert client.call("sum", 1, 2) == 3
+            client.close()
+    finally:
+        server.stop()
+
+
+@pytest.mark.parametrize("reuse_port", [True, False])
+def test_compat_server_spawn(monkeypatch, reuse_port):
+    if not reuse_port:
+        # the workers share a socket bound by the parent
+        monkeypatch.delattr(socket, "SO_REUSEPORT", raising=False)
+
+    server = Server(Bindings(), workers=2, mp_context=mp.get_context("spawn"))
+    server.listen("127.0.0.1", 8889)
+    server.start()
+
+    try:
+        assert len(server.processes) == 2
+
+        # the spawned workers take a while to listen
+        for _ in range(100):
+            try:
+                client = Client("127.0.0.1", 8889)
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.05)
+
+        with client:
+            assert client.call("sum", 1, 2) == 3
+    finally:
+        server.stop()
+
+
+def test_compat_server_graceful_stop():
+    server = Server(Bindings())
+    server.listen("127.0.0.1", 8889)
+    server.start()
+
+    try:
+        with Client("127.0.0.1", 8889) as client:
+            assert client.call("sum", 1, 2) == 3
+
+            future = client.call_async("slow_sum", 1, 2)
+            time.sleep(0.1)
+
+            stopper = threading.Thread(target=server.stop)
+            stopper.start()
+
+            # in-flight request is drained before the worker exits
+            assert future.get(timeout=2) == 3
+            stopper.join()
+    finally:
+        server.stop()
+
+
+def test_compat_server_unix_socket(tmp_path):
+    from msgpackio.aio import AsyncRPCClient
+
+    address = f"unix://{tmp_path}/server.sock"
+    server = Server(Bindings(), workers=2)
+    server.listen(address)
+    server.start()
+
+    async def main():
+        async with await AsyncRPCClient.connect(address) as client:
+            return await client.call("sum", 1, 2)
+
+    try:
+        with Client(address) as client:
+            assert client.call("sum", 1, 2) == 3
+
+        assert asyncio.run(main()) == 3
+    finally:
+        server.stop()
+
+    assert not (tmp_path / "server.sock").exists()
@@ -0,0 +1,178 @@
+import asyncio
+import os
+
+import pytest
+
+from msgpackio.aio import AsyncRPCClient
+from msgpackio.compat import Client, Server
+from msgpackio.compression import (
+    CODECS,
+    Compressed,
+    Compressor,
+    Decompressor,
+    available,
+)
+from msgpackio.ext import registry
+from msgpackio.server import RPCServer
+from msgpackio.tracing import TraceAggregator
+
+from conftest import Transport
+
+
+class Bindings:
+    def echo(self, value):
+        return value
+
+
+@pytest.fixture
+def server():
+    server = Server(Bindings())
+    server.listen("127.0.0.1", 8896)
+    server.start()
+
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+def decode(data, codec="zlib"):
+    unpacker = registry.unpacker()
+    unpacker.feed(data)
+
+    decompressor = Decompressor([CODECS[codec]])
+    return [
+        decompressor.decompress(msg) if isinstance(msg, Compressed) else msg
+        for msg in unpacker
+    ]
+
+
+@pytest.mark.parametrize("name", available())
+def test_compressor(name):
+    compressor = Compressor(CODECS[name], 1024)
+    packer = registry.packer()
+
+    small = packer.pack([0, 1, "echo", [b"x" * 100]])
+    assert compressor.compress(small) is small
+
+    msg = [0, 1, "echo", [b"x" * 65536, list(range(1000))]]
+    large = packer.pack(msg)
+    compressed = compressor.compress(large)
+    assert len(compressed) < len(large) / 5
+    assert decode(compressed, name) == [msg]
+
+    # incompressible messages are sent as they are
+    noise = packer.pack([0, 1, "echo", [os.urandom(65536)]])
+    assert compressor.compress(noise) is noise
+
+
+def test_decompressor_limits():
+    packer = registry.packer()
+    compressor = Compressor(CODECS["zlib"], 1024)
+    frame = compressor.compress(packer.pack([0, 1, "echo", [b"x" * (1 << 20)]]))
+
+    unpacker = registry.unpacker()
+    unpacker.feed(frame)
+    compressed = next(unpacker)
+
+    # the registry leaves the messages compressed
+    assert isinstance(compressed, Compressed)
+
+    assert Decompressor([CODECS["zlib"]]).decompress(compressed)[3] == [
+        b"x" * (1 << 20)
+    ]
+
+    with pytest.raises(ValueError):
+        Decompressor([CODECS["zlib"]], max_size=1 << 19).decompress(compressed)
+
+    with pytest.raises(ValueError):
+        Decompressor([]).decompress(compressed)
+
+    with pytest.raises(ValueError):
+        Decompressor([CODECS["zlib"]]).decompress(Compressed(1, b"garbage"))
+
+
+def test_server_rejects_compressed():
+    packer = registry.packer()
+    compressor = Compressor(CODECS["zlib"], 1024)
+    frame = compressor.compress(packer.pack([0, 1, "echo", [b"x" * (1 << 20)]]))
+
+    # without negotiation
+    for server in [RPCServer(Bindings(), compression=False), RPCServer(Bindings())]:
+        transport = Transport()
+        server.connection_made(transport)
+        server.data_received(frame)
+
+        assert transport.aborted
+        assert transport.writes == []
+
+    server = RPCServer(Bindings())
+    transport = Transport()
+    server.connection_made(transport)
+    assert server.negotiate_compression(["zlib"], 1024) == "zlib"
+
+    server.data_received(frame)
+    assert not transport.aborted
+
+    # larger than max_size once decompressed
+    server.decompressor.max_size = 1 << 19
+    server.data_received(frame)
+    assert transport.aborted
+
+
+def test_negotiation_refused():
+    server = RPCServer(None, compression=False)
+    assert server.negotiate_compression(["zlib"], 1024) is None
+
+    server = RPCServer(None)
+    assert server.negotiate_compression(["unknown", "zlib"], 1024) == "zlib"
+    assert server.negotiate_compression(["unknown"], 1024) is None
+    assert server.compressor is None
+
+
+def test_client_compression(server):
+    payload = b"x" * (1 << 20)
+
+    with Client("127.0.0.1", 8896, compression=True, compression_threshold=1024) as c:
+        assert c.client.codec == available()[0]
+
+        assert c.call("echo", payload) == payload
+        assert c.call("echo", b"small") == b"small"
+        assert c.call_many([("echo", (payload,))] * 4) == [payload] * 4
+
+        # the request was received compressed
+        stats = c.call("__stats__")["methods"]["echo"]
+        assert stats["bytes_in"] < len(payload)
+
+    with Client("127.0.0.1", 8896, compression=["unknown"]) as client:
+        assert client.client.codec is None
+        assert client.call("echo", payload) == payload
+
+
+def test_traced_client_compression(server):
+    payload = b"x" * (1 << 20)
+    tracer = TraceAggregator()
+
+    with Client("127.0.0.1", 8896, compression=["zlib"], tracer=tracer) as client:
+        assert client.call("echo", payload) == payload
+        assert client.call_many([("echo", (payload,))] * 2) == [payload] * 2
+
+        # the traced requests are compressed as well
+        stats = client.call("__stats__")["methods"]["echo"]
+        assert stats["bytes_in"] < len(payload)
+
+    assert tracer.summary()["pack"]["count"] > 0
+
+
+def test_async_client_compression(server):
+    payload = list(range(100000))
+
+    async def main():
+        async with await AsyncRPCClient.connect(
+            "127.0.0.1", 8896, compression=["zlib"], compression_threshold=1024
+        ) as client:
+            assert client.codec == "zlib"
+            assert await client.call("echo", payload) == payload
+            assert await client.call("echo", 1) == 1
+
+    asyncio.run(main())
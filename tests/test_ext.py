@@ -0,0 +1,72 @@
+import datetime
+
+import pytest
+
+from msgpackio.compat import Client, Server
+from msgpackio.ext import ExtRegistry, registry
+
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def test_ext_registry():
+    ext = ExtRegistry()
+    ext.register(Point, 42, lambda p: bytes([p.x, p.y]), lambda data: Point(*data))
+
+    with pytest.raises(ValueError):
+        ext.register(Point, 42, None, None)
+
+    unpacker = ext.unpacker()
+    unpacker.feed(ext.packer().pack([Point(1, 2), datetime.datetime(2021, 1, 1)]))
+    point, date = next(unpacker)
+
+    assert (point.x, point.y) == (1, 2)
+    assert date == datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class Bindings:
+    def double(self, array):
+        return array * 2
+
+
+def test_ext_ndarray():
+    np = pytest.importorskip("numpy")
+
+    server = Server(Bindings())
+    server.listen("127.0.0.1", 8892)
+    server.start()
+
+    try:
+        with Client("127.0.0.1", 8892) as client:
+            array = np.arange(12, dtype=np.float32).reshape(3, 4)[:, ::2]
+            result = client.call("double", array)
+
+            assert result.dtype == array.dtype
+            assert result.shape == array.shape
+            assert (result == array * 2).all()
+    finally:
+        server.stop()
+
+
+def test_ext_ndarray_dtypes():
+    np = pytest.importorskip("numpy")
+
+    dtype = np.dtype([("id", "<i4"), ("pos", "<f8", (2,)), ("tag", "S3")], align=True)
+    array = np.zeros(4, dtype=dtype)
+    array["id"] = np.arange(4)
+    array["pos"][:, 1] = 1.5
+    array["tag"] = b"abc"
+
+    unpacker = registry.unpacker()
+    unpacker.feed(registry.packb(array))
+    result = next(unpacker)
+
+    assert result.dtype == dtype
+    assert (result == array).all()
+
+    # Python objects cannot be sent as raw bytes
+    with pytest.raises(TypeError, match="Python objects"):
+        registry.packb(np.array([1, "a", None], dtype=object))
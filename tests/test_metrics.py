@@ -0,0 +1,148 @@
+import asyncio
+import multiprocessing as mp
+import time
+
+import msgpack
+import pytest
+
+from msgpackio.compat import Client, Server
+from msgpackio.metrics import Histogram
+from msgpackio.rpc import NOTIFY, REQUEST
+from msgpackio.server import RPCServer
+
+from conftest import Transport
+
+
+class Bindings:
+    def sum(self, x, y):
+        return x + y
+
+    def fail(self):
+        raise ValueError("fail")
+
+    def wait(self, seconds):
+        time.sleep(seconds)
+
+    async def slow(self, x):
+        await asyncio.sleep(0.01)
+        return x
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+
+    for i in range(1, 1001):
+        histogram.record(i * 1e-6)
+
+    assert histogram.count == 1000
+    assert histogram.summary()["max"] == pytest.approx(1000e-6, rel=0.02)
+    assert histogram.percentile(0.5) == pytest.approx(500e-6, rel=0.02)
+    assert histogram.percentile(0.99) == pytest.approx(990e-6, rel=0.02)
+
+    other = Histogram()
+    other.record(1)
+    histogram.merge(other)
+    assert histogram.count == 1001
+    assert histogram.percentile(1) == pytest.approx(1, rel=0.02)
+
+
+def test_server_method_metrics():
+    server = RPCServer(Bindings())
+    server.connection_made(Transport())
+
+    data = b"".join(msgpack.packb([REQUEST, i, "sum", [i, 1]]) for i in range(10))
+    data += msgpack.packb([REQUEST, 10, "fail", []])
+    data += msgpack.packb([REQUEST, 11, "missing", []])
+    server.data_received(data)
+
+    stats = server.bindings.stats()
+    assert stats["unknown"] == 1
+
+    metrics = stats["methods"]["sum"]
+    assert metrics["requests"] == 10
+    assert metrics["errors"] == 0
+    assert metrics["bytes_in"] == len(msgpack.packb([REQUEST, 0, "sum", [0, 1]])) * 10
+    assert metrics["bytes_out"] > 0
+    assert metrics["handler_time"]["count"] == 10
+    assert metrics["queue_time"]["count"] == 10
+
+    assert stats["methods"]["fail"]["errors"] == 1
+
+
+def test_server_handler_time_after_notify():
+    server = RPCServer(Bindings())
+    server.connection_made(Transport())
+
+    data = msgpack.packb([NOTIFY, "wait", [0.05]])
+    data += msgpack.packb([REQUEST, 0, "sum", [1, 2]])
+    server.data_received(data)
+
+    # the notification is charged to the queue time of the request, not its handler
+    metrics = server.bindings.stats()["methods"]["sum"]
+    assert metrics["handler_time"]["max"] < 0.025
+    assert metrics["queue_time"]["max"] >= 0.04
+
+
+def test_server_untimed_metrics():
+    async def main():
+        server = RPCServer(Bindings(), metrics=False)
+        server.connection_made(Transport())
+
+        data = b"".join(msgpack.packb([REQUEST, i, "sum", [i, 1]]) for i in range(10))
+        data += msgpack.packb([REQUEST, 10, "slow", [1]])
+        server.data_received(data)
+        await server.drain()
+
+        return server.bindings.stats()["methods"]
+
+    stats = asyncio.run(main())
+
+    # the requests are counted without being timed
+    for method, requests in [("sum", 10), ("slow", 1)]:
+        assert stats[method]["requests"] == requests
+        assert stats[method]["bytes_out"] > 0
+        assert stats[method]["handler_time"]["count"] == 0
+        assert stats[method]["queue_time"]["count"] == 0
+
+
+def test_server_stats_rpc():
+    server = Server(Bindings())
+    server.listen("127.0.0.1", 8893)
+    server.start()
+
+    try:
+        with Client("127.0.0.1", 8893) as client:
+            assert client.call("sum", 1, 2) == 3
+            assert client.call("slow", 1) == 1
+
+            stats = client.call("__stats__")
+            assert stats["methods"]["sum"]["requests"] == 1
+
+            slow = stats["methods"]["slow"]
+            assert slow["requests"] == 1
+            assert slow["in_flight"] == 0
+            assert slow["handler_time"]["p50"] >= 0.005
+
+            assert "__stats__" not in client.call("list_functions")
+    finally:
+        server.stop()
+
+
+def test_server_metrics_exporter():
+    queue = mp.Queue()
+
+    server = Server(Bindings(), exporter=queue.put, export_interval=0.05)
+    server.listen("127.0.0.1", 8893)
+    server.start()
+
+    try:
+        with Client("127.0.0.1", 8893) as client:
+            assert client.call("sum", 1, 2) == 3
+
+        while True:
+            snapshot = queue.get(timeout=5)
+
+            if snapshot["methods"]["sum"]["requests"] == 1:
+                break
+    finally:
+        server.stop()
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+
+import pytest
+
+from msgpackio.aio import AsyncRPCClient
+from msgpackio.compat import Client, Server
+from msgpackio.exceptions import RemoteException
+from msgpackio.server import binding
+
+
+class Bindings:
+    @binding(peer=True)
+    async def ask(self, peer, x):
+        return await peer.call("double", x)
+
+    @binding(peer=True)
+    async def ask_missing(self, peer):
+        try:
+            await peer.call("missing", timeout=1)
+        except RemoteException as err:
+            return str(err)
+
+    @binding(peer=True)
+    def subscribe(self, peer, n):
+        for i in range(n):
+            peer.notify("on_event", i)
+
+        return n
+
+
+class ClientBindings:
+    def __init__(self):
+        self.events = []
+        self.done = threading.Event()
+
+    def double(self, x):
+        return x * 2
+
+    def on_event(self, i):
+        self.events.append(i)
+
+        if len(self.events) == 10:
+            self.done.set()
+
+
+@pytest.fixture
+def server():
+    server = Server(Bindings())
+    server.listen("127.0.0.1", 8898)
+    server.start()
+
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+def test_server_calls_client(server):
+    bindings = ClientBindings()
+
+    with Client("127.0.0.1", 8898, bindings=bindings) as client:
+        assert client.call("ask", 21) == 42
+        assert "not available" in client.call("ask_missing")
+
+        assert client.call("subscribe", 10) == 10
+        assert bindings.done.wait(5)
+        assert bindings.events == list(range(10))
+
+
+def test_server_calls_client_full_window(server):
+    bindings = ClientBindings()
+
+    with Client("127.0.0.1", 8898, bindings=bindings, max_in_flight=2) as client:
+        futures = []
+
+        def produce():
+            for i in range(20):
+                futures.append(client.call_async("ask", i))
+
+        # the producer waits for the window while the server calls the client
+        producer = threading.Thread(target=produce)
+        producer.start()
+        producer.join(timeout=5)
+
+        assert not producer.is_alive()
+        assert [future.get(timeout=5) for future in futures] == [
+            i * 2 for i in range(20)
+        ]
+
+
+def test_server_calls_client_without_bindings(server):
+    with Client("127.0.0.1", 8898) as client:
+        with pytest.raises(RemoteException):
+            client.call("ask", 21)
+
+        # the notifications are discarded
+        assert client.call("subscribe", 10) == 10
+
+
+def test_server_calls_async_client(server):
+    class AsyncBindings:
+        def __init__(self):
+            self.events = asyncio.Queue()
+
+        async def double(self, x):
+            await asyncio.sleep(0)
+            return x * 2
+
+        def on_event(self, i):
+            self.events.put_nowait(i)
+
+    async def main():
+        bindings = AsyncBindings()
+
+        async with await AsyncRPCClient.connect(
+            "127.0.0.1", 8898, bindings=bindings
+        ) as client:
+            assert await client.call("ask", 21) == 42
+            assert await client.call("subscribe", 3) == 3
+
+            events = [await bindings.events.get() for _ in range(3)]
+            assert events == [0, 1, 2]
+
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from msgpackio.compat import Server
+from msgpackio.pool import ConnectionPool, PoolTimeout
+
+
+class Bindings:
+    def sum(self, x, y):
+        return x + y
+
+
+def test_connection_pool():
+    server = Server(Bindings())
+    server.listen("127.0.0.1", 8891)
+    server.start()
+
+    try:
+        with ConnectionPool("127.0.0.1", 8891, size=2, check_interval=0) as pool:
+            assert pool.call("sum", 1, 2) == 3
+            assert pool.call("sum", 1, 2) == 3
+
+            a = pool.acquire()
+            b = pool.acquire()
+
+            with pytest.raises(PoolTimeout):
+                pool.acquire(timeout=0.1)
+
+            pool.release(a)
+            assert pool.acquire() is a
+
+            pool.release(a)
+            pool.release(b)
+
+            stats = pool.stats()
+            assert stats["misses"] == 2
+            assert stats["hits"] == 3
+            assert stats["waits"] == 1
+            assert stats["idle"] == 2
+    finally:
+        server.stop()
+
+
+def test_connection_pool_evict_dead():
+    server = Server(Bindings())
+    server.listen("127.0.0.1", 8891)
+    server.start()
+
+    with ConnectionPool("127.0.0.1", 8891, size=2, check_interval=0) as pool:
+        try:
+            assert pool.call("sum", 1, 2) == 3
+        finally:
+            server.stop()
+
+        server.start()
+
+        try:
+            time.sleep(0.1)
+            # the dead connection is evicted and a new one is opened
+            assert pool.call("sum", 1, 2) == 3
+            assert pool.stats()["evicted"] == 1
+        finally:
+            server.stop()
+
+
+def test_connection_pool_evict_idle():
+    server = Server(Bindings())
+    server.listen("127.0.0.1", 8891)
+    server.start()
+
+    try:
+        with ConnectionPool("127.0.0.1", 8891, size=2, max_idle=0.05) as pool:
+            client = pool.acquire()
+            pool.release(client)
+            close = client.close
+            unlocked = []
+
+            def closing():
+                # the pool can be used while the idle connection is closed
+                other = threading.Thread(target=pool.stats)
+                other.start()
+                other.join(1)
+                unlocked.append(not other.is_alive())
+                close()
+
+            client.close = closing
+            time.sleep(0.1)
+
+            assert pool.call("sum", 1, 2) == 3
+            assert unlocked == [True]
+            assert pool.stats()["evicted"] == 1
+    finally:
+        server.stop()
@@ -0,0 +1,173 @@
+import asyncio
+import threading
+
+import pytest
+
+from msgpackio.aio import AsyncRPCClient
+from msgpackio.compat import Client, Server
+from msgpackio.compression import CODECS, Compressed, Compressor, Decompressor
+from msgpackio.ext import registry
+from msgpackio.pubsub import DISCONNECT, DROP_NEWEST, DROP_OLDEST, Topics
+
+from conftest import Transport
+
+
+class Bindings:
+    def echo(self, value):
+        return value
+
+
+class Protocol:
+    def __init__(self, compressor=None):
+        self.compressor = compressor
+        self.writing_paused = False
+        self.transport = Transport()
+        self.written = []
+
+    def write(self, data):
+        self.written.append(data)
+
+    def flush(self):
+        pass
+
+    def messages(self):
+        unpacker = registry.unpacker()
+        unpacker.feed(b"".join(self.written))
+        decompressor = Decompressor([CODECS["zlib"]])
+
+        return [
+            (decompressor.decompress(msg) if isinstance(msg, Compressed) else msg)[2][1]
+            for msg in unpacker
+        ]
+
+
+@pytest.fixture
+def server():
+    server = Server(Bindings())
+    server.listen("127.0.0.1", 8899)
+    server.start()
+
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+def test_topics_publish():
+    topics = Topics()
+    a, b = Protocol(), Protocol()
+
+    topics.subscribe(a, "news")
+    topics.subscribe(b, "news")
+    topics.subscribe(b, "sport")
+
+    assert topics.publish("news", 1) == 2
+    assert topics.publish("sport", 2) == 1
+    assert topics.publish("weather", 3) == 0
+
+    # the same bytes are written to every subscriber
+    assert a.written[0] is b.written[0]
+    assert a.messages() == [1]
+    assert b.messages() == [1, 2]
+
+    topics.unsubscribe(b, "news")
+    assert topics.publish("news", 4) == 1
+
+    topics.unsubscribe(b)
+    assert topics.stats()["topics"] == {"news": 1}
+    assert topics.stats()["subscribers"] == 1
+
+
+def test_topics_compressed_once():
+    topics = Topics()
+    compressor = Compressor(CODECS["zlib"], 1024)
+    a, b = Protocol(compressor), Protocol(compressor)
+
+    topics.subscribe(a, "news")
+    topics.subscribe(b, "news")
+
+    message = b"x" * 65536
+    topics.publish("news", message)
+    assert a.written[0] is b.written[0]
+    assert len(a.written[0]) < len(message)
+    assert a.messages() == [message]
+
+
+@pytest.mark.parametrize(
+    "policy,expected", [(DROP_OLDEST, [2, 3, 4]), (DROP_NEWEST, [0, 1, 2])]
+)
+def test_topics_slow_subscriber(policy, expected):
+    topics = Topics(max_queue=3, policy=policy)
+    protocol = Protocol()
+    subscriber = topics.subscribe(protocol, "news")
+
+    protocol.writing_paused = True
+    for i in range(5):
+        topics.publish("news", i)
+
+    assert protocol.written == []
+    assert topics.stats()["queued"] == 3
+    assert topics.stats()["dropped"] == 2
+
+    protocol.writing_paused = False
+    subscriber.drain()
+    assert protocol.messages() == expected
+
+
+def test_topics_disconnect():
+    topics = Topics(max_queue=2, policy=DISCONNECT)
+    protocol = Protocol()
+    topics.subscribe(protocol, "news")
+
+    protocol.writing_paused = True
+    for i in range(3):
+        topics.publish("news", i)
+
+    assert protocol.transport.aborted
+
+    with pytest.raises(ValueError):
+        Topics(policy="unknown")
+
+
+def test_client_pubsub(server):
+    received = []
+    done = threading.Event()
+
+    def on_message(message):
+        received.append(message)
+
+        if len(received) == 10:
+            done.set()
+
+    with Client("127.0.0.1", 8899) as client, Client("127.0.0.1", 8899) as other:
+        assert client.subscribe("news", on_message)
+
+        for i in range(10):
+            assert other.publish("news", i) == 1
+
+        assert done.wait(5)
+        assert received == list(range(10))
+
+        stats = other.call("__stats__")["topics"]
+        assert stats["topics"] == {"news": 1}
+        assert stats["delivered"] == 10
+
+        assert client.unsubscribe("news")
+        assert other.publish("news", 10) == 0
+        assert client.call("echo", 1) == 1
+
+    # the subscriptions end with the connection
+    with Client("127.0.0.1", 8899) as client:
+        assert client.call("__stats__")["topics"]["subscribers"] == 0
+
+
+def test_async_client_pubsub(server):
+    async def main():
+        messages = asyncio.Queue()
+
+        async with await AsyncRPCClient.connect("127.0.0.1", 8899) as client:
+            assert await client.subscribe("news", messages.put_nowait)
+            assert await client.publish("news", {"a": 1}) == 1
+            assert await messages.get() == {"a": 1}
+
+    asyncio.run(main())
@@ -8,9 +8,11 @@ import msgpack
 
 from msgpackio.client import Client
 from msgpackio.rpc import RPCClient
-from msgpackio.server import RPCServer
+from msgpackio.server import RPCServer, binding
 from msgpackio.exceptions import RemoteException
 
+from conftest import Transport
+
 
 log = logging.getLogger(__name__)
 
@@ -57,6 +59,7 @@ def test_rpc_client_async(cls):
 
     finally:
         s.terminate()
+        s.join()
 
 
 @pytest.mark.parametrize("cls", clients)
@@ -80,3 +83,301 @@ def test_rpc_client_async_missing_key(cls):
 
     finally:
         s.terminate()
+        s.join()
+
+
+def sleep(duration):
+    import time
+
+    time.sleep(duration)
+    return duration
+
+
+@pytest.mark.parametrize("cls", clients)
+def test_rpc_client_get_timeout(cls):
+    import time
+
+    s = mp.Process(target=server, kwargs=dict(sleep=sleep))
+    s.start()
+
+    try:
+        with RPCClient(cls("127.0.0.1", 8888)) as client:
+            future = client.call_async("sleep", 0.5)
+
+            start = time.time()
+            with pytest.raises(TimeoutError):
+                future.get(timeout=0.1)
+
+            assert time.time() - start < 0.4
+            assert future.get(timeout=2) == 0.5
+
+    finally:
+        s.terminate()
+        s.join()
+
+
+@pytest.mark.parametrize("cls", clients)
+def test_rpc_client_lost_future(cls):
+    from msgpackio.rpc import LostFuture
+
+    s = mp.Process(target=server, kwargs=dict(sleep=sleep))
+    s.start()
+
+    try:
+        with RPCClient(cls("127.0.0.1", 8888)) as client:
+            future = client.call_async("sleep", 10)
+            s.terminate()
+
+            with pytest.raises(LostFuture):
+                future.get(timeout=5)
+
+            # nothing would resolve the requests sent from now on
+            with pytest.raises(LostFuture):
+                client.call_async("sleep", 10)
+
+            with pytest.raises(LostFuture):
+                client.call("sleep", 10)
+
+            with pytest.raises(LostFuture):
+                client.call_many([("sleep", (10,))])
+
+            with pytest.raises(LostFuture):
+                client.call_stream("sleep", 10)
+
+    finally:
+        s.terminate()
+        s.join()
+
+
+async def async_add(a, b, delay):
+    await asyncio.sleep(delay)
+    return a + b
+
+
+@binding(executor=True, concurrency=1)
+def blocking_sleep(duration):
+    import time
+
+    time.sleep(duration)
+    return duration
+
+
+@pytest.mark.parametrize("cls", clients)
+def test_rpc_server_async_binding(cls):
+    s = mp.Process(target=server, kwargs=dict(add=add, async_add=async_add))
+    s.start()
+
+    try:
+        with RPCClient(cls("127.0.0.1", 8888)) as client:
+            slow = client.call_async("async_add", 1, 2, 0.5)
+            fast = client.call_async("add", 1, 2)
+
+            # the slow coroutine does not block the loop
+            assert fast.get(timeout=0.4) == 3
+            assert slow.ready() is False
+            assert slow.get(timeout=2) == 3
+
+    finally:
+        s.terminate()
+        s.join()
+
+
+@pytest.mark.parametrize("cls", clients)
+def test_rpc_server_executor_binding(cls):
+    import time
+
+    s = mp.Process(target=server, kwargs=dict(add=add, sleep=blocking_sleep))
+    s.start()
+
+    try:
+        with RPCClient(cls("127.0.0.1", 8888)) as client:
+            start = time.time()
+            first = client.call_async("sleep", 0.3)
+            second = client.call_async("sleep", 0.3)
+
+            assert client.call_async("add", 1, 2).get(timeout=0.2) == 3
+
+            # concurrency=1 serializes the executions
+            assert first.get(timeout=2) == 0.3
+            assert second.get(timeout=2) == 0.3
+            assert time.time() - start >= 0.6
+
+    finally:
+        s.terminate()
+        s.join()
+
+
+@pytest.mark.parametrize("cls", clients)
+def test_rpc_client_call_many(cls):
+    s = mp.Process(target=server, kwargs=dict(add=add))
+    s.start()
+
+    try:
+        with RPCClient(cls("127.0.0.1", 8888)) as client:
+            calls = [("add", (i, 1)) for i in range(100)]
+            assert client.call_many(calls, timeout=2) == [i + 1 for i in range(100)]
+
+            calls = [("add", (1, 1)), ("missing", ()), ("add", (2, 1))]
+            with pytest.raises(RemoteException):
+                client.call_many(calls, timeout=2)
+
+            results = client.call_many(calls, timeout=2, return_exceptions=True)
+            assert results[0] == 2
+            assert isinstance(results[1], RemoteException)
+            assert results[2] == 3
+
+    finally:
+        s.terminate()
+        s.join()
+
+
+def payload(size):
+    return b"x" * size
+
+
+@pytest.mark.parametrize("cls", clients)
+def test_rpc_client_large_payload(cls):
+    s = mp.Process(target=server, kwargs=dict(add=add, payload=payload))
+    s.start()
+
+    try:
+        with RPCClient(cls("127.0.0.1", 8888)) as client:
+            for size in [10, 100_000, 10_000_000]:
+                result = client.call("payload", size)
+                assert len(result) == size
+                assert bytes(result[-10:]) == b"x" * 10
+
+            # large bin received zero-copy
+            assert isinstance(client.call("payload", 100_000), memoryview)
+
+            calls = [("payload", (100_000,)), ("add", (1, 2))] * 10
+            results = client.call_many(calls, timeout=5)
+            assert results[1::2] == [3] * 10
+            assert all(len(r) == 100_000 for r in results[::2])
+
+    finally:
+        s.terminate()
+        s.join()
+
+
+@pytest.mark.parametrize("cls", clients)
+def test_rpc_client_max_in_flight(cls):
+    from msgpackio.rpc import BackpressureError
+
+    s = mp.Process(target=server, kwargs=dict(add=add, sleep=sleep))
+    s.start()
+
+    try:
+        client = RPCClient(cls("127.0.0.1", 8888), max_in_flight=2, block=False)
+
+        with client:
+            first = client.call_async("sleep", 0.2)
+            second = client.call_async("add", 1, 2)
+
+            with pytest.raises(BackpressureError):
+                client.call_async("add", 1, 2)
+
+            first.get(timeout=2)
+            second.get(timeout=2)
+            assert client.call("add", 1, 2) == 3
+
+        client = RPCClient(cls("127.0.0.1", 8888), max_in_flight=4)
+
+        with client:
+            calls = [("add", (i, 1)) for i in range(50)]
+            assert client.call_many(calls, timeout=2) == [i + 1 for i in range(50)]
+
+            stats = client.window_stats()
+            assert stats["peak_in_flight"] == 4
+            assert stats["in_flight"] == 0
+    finally:
+        s.terminate()
+        s.join()
+
+
+@pytest.mark.parametrize("cls", clients)
+def test_rpc_client_full_window_writes(cls):
+    import time
+
+    s = mp.Process(target=server, kwargs=dict(add=add, sleep=sleep))
+    s.start()
+
+    try:
+        with RPCClient(cls("127.0.0.1", 8888), max_in_flight=1) as client:
+            first = client.call_async("sleep", 1)
+
+            # blocks until the first response frees the window
+            results = []
+            producer = threading.Thread(
+                target=lambda: results.append(client.call("add", 1, 2))
+            )
+            producer.start()
+            time.sleep(0.1)
+
+            # the blocked producer does not hold up the other writes
+            start = time.monotonic()
+            client.notify("add", 1, 2)
+            assert time.monotonic() - start < 0.5
+            assert not first.ready()
+
+            producer.join(timeout=5)
+            assert results == [3]
+            assert first.get(timeout=1) == 1
+
+    finally:
+        s.terminate()
+        s.join()
+
+
+@pytest.mark.parametrize("cls", clients)
+def test_rpc_client_deadline(cls):
+    import time
+
+    s = mp.Process(
+        target=server, kwargs=dict(add=add, async_add=async_add, sleep=sleep)
+    )
+    s.start()
+
+    try:
+        with RPCClient(cls("127.0.0.1", 8888)) as client:
+            # the async binding is cancelled by the server
+            future = client.call_async("async_add", 1, 2, 1, timeout=0.1)
+
+            start = time.time()
+            with pytest.raises(TimeoutError):
+                future.get()
+
+            assert time.time() - start < 0.5
+            assert client._pending_results == dict()
+
+            # expired requests are evicted even if nobody waits on them
+            expired = client.call_async("async_add", 1, 2, 1, timeout=0.1)
+            time.sleep(0.2)
+
+            assert client.call("add", 1, 2, timeout=1) == 3
+            assert client._pending_results == dict()
+
+            with pytest.raises(TimeoutError):
+                expired.get()
+    finally:
+        s.terminate()
+        s.join()
+
+
+def test_rpc_server_drop_expired():
+    import time
+
+    server = RPCServer(add=add)
+    transport = Transport()
+    server.connection_made(transport)
+
+    data = msgpack.packb([0, 1, "add", [1, 2], 0]) + msgpack.packb(
+        [0, 2, "add", [1, 2], 10]
+    )
+    server.data_received(data)
+
+    assert server.expired == 1
+
+    unpacker = msgpack.Unpacker()
+    unpacker.feed(b"".join(transport.writes[0]))
+    assert list(unpacker) == [[1, 2, None, 3]]
@@ -0,0 +1,204 @@
+import logging
+
+import msgpack
+
+from msgpackio.rpc import NOTIFY, REQUEST, RESPONSE
+from msgpackio.server import RPCServer, binding
+
+from conftest import Transport
+
+
+def add(a, b):
+    return a + b
+
+
+def test_server_coalesce_responses():
+    server = RPCServer(add=add)
+    transport = Transport()
+    server.connection_made(transport)
+
+    data = b"".join(msgpack.packb([REQUEST, i, "add", [i, 1]]) for i in range(100))
+    server.data_received(data)
+
+    # a single write for the whole batch
+    assert len(transport.writes) == 1
+
+    unpacker = msgpack.Unpacker()
+    unpacker.feed(b"".join(transport.writes[0]))
+    assert list(unpacker) == [[RESPONSE, i, None, i + 1] for i in range(100)]
+
+
+def test_server_coalesce_flush_size():
+    server = RPCServer(add=add, flush_size=64)
+    transport = Transport()
+    server.connection_made(transport)
+
+    data = b"".join(msgpack.packb([REQUEST, i, "add", [i, 1]]) for i in range(100))
+    server.data_received(data)
+
+    assert len(transport.writes) > 1
+    assert all(sum(map(len, w)) < 64 + 16 for w in transport.writes)
+
+
+def test_server_pause_reading():
+    server = RPCServer(add=add)
+    transport = Transport()
+    server.connection_made(transport)
+
+    server.pause_writing()
+    assert transport.reading is False
+
+    server.resume_writing()
+    assert transport.reading is True
+
+
+class Exposed:
+    value = 1
+
+    def sum(self, a, b):
+        return a + b
+
+    def _private(self):
+        return 0
+
+
+def test_server_bindings_allow_list():
+    server = RPCServer(Exposed(), add=add)
+    transport = Transport()
+    server.connection_made(transport)
+
+    methods = ["sum", b"sum", "add", "_private", "__class__", "value", "ping"]
+    data = b"".join(
+        msgpack.packb([REQUEST, i, method, [1, 2] if i < 3 else []])
+        for i, method in enumerate(methods)
+    )
+    server.data_received(data)
+
+    unpacker = msgpack.Unpacker()
+    unpacker.feed(b"".join(transport.writes[0]))
+    responses = list(unpacker)
+
+    assert [r[3] for r in responses[:3]] == [3, 3, 3]
+    assert all(r[2] is not None for r in responses[3:6])
+    assert responses[6][3] is True
+
+    functions = server.bindings.list_functions()
+    assert sorted(functions) == ["add", "list_functions", "ping", "sum"]
+
+
+def test_server_trace(caplog):
+    server = RPCServer(add=add, trace=True, trace_every=2)
+    server.connection_made(Transport())
+
+    data = b"".join(msgpack.packb([REQUEST, i, "add", [i, 1]]) for i in range(4))
+    data += msgpack.packb([NOTIFY, "add", [b"x" * 1024, b"y"]])
+
+    with caplog.at_level(logging.DEBUG, logger="msgpackio.server.trace"):
+        server.data_received(data)
+
+    fields = [record.args[0].fields() for record in caplog.records]
+    assert [(f["direction"], f["kind"]) for f in fields] == [
+        ("recv", "request"),
+        ("send", "response"),
+        ("recv", "request"),
+        ("send", "response"),
+        ("recv", "notify"),
+    ]
+    assert [f.get("msgid") for f in fields[:4]] == [0, 0, 2, 2]
+    assert fields[4]["params"] == ["bytes[1024]", "bytes[1]"]
+    assert str(caplog.records[0].args[0]).startswith("direction=recv kind=request")
+
+
+class Cached:
+    def __init__(self):
+        self.calls = 0
+
+    @binding(cache=2)
+    def lookup(self, key):
+        self.calls += 1
+        return [key] * 3
+
+    @binding(cache=16, ttl=0)
+    def expired(self, key):
+        self.calls += 1
+        return key
+
+
+def responses(transport):
+    unpacker = msgpack.Unpacker()
+    unpacker.feed(b"".join(b"".join(w) for w in transport.writes))
+    transport.writes = []
+    return list(unpacker)
+
+
+def test_server_cache():
+    bindings = Cached()
+    server = RPCServer(bindings)
+    transport = Transport()
+    server.connection_made(transport)
+
+    # msgids of every size hit the same entry
+    msgids = [1, 200, 70000, 1 << 33]
+    server.data_received(
+        b"".join(msgpack.packb([REQUEST, i, "lookup", ["a"]]) for i in msgids)
+    )
+    assert responses(transport) == [[RESPONSE, i, None, ["a"] * 3] for i in msgids]
+    assert bindings.calls == 1
+
+    # a request split across two reads is not cached but still answered
+    data = msgpack.packb([REQUEST, 5, "lookup", ["a"]])
+    server.data_received(data[:3])
+    server.data_received(data[3:])
+    assert responses(transport) == [[RESPONSE, 5, None, ["a"] * 3]]
+    assert bindings.calls == 2
+
+    # the least recently used entry is evicted
+    for key in ["b", "c", "a"]:
+        server.data_received(msgpack.packb([REQUEST, 6, "lookup", [key]]))
+    assert bindings.calls == 5
+
+    server.data_received(msgpack.packb([REQUEST, 7, "__invalidate__", ["lookup"]]))
+    assert responses(transport)[-1] == [RESPONSE, 7, None, 2]
+
+    server.data_received(msgpack.packb([REQUEST, 8, "lookup", ["c"]]))
+    assert bindings.calls == 6
+
+    stats = server.bindings.stats()["methods"]["lookup"]
+    assert stats["requests"] == 9
+    assert stats["cache"]["hits"] == 3
+    assert stats["cache"]["evictions"] == 2
+    assert stats["cache"]["entries"] == 1
+
+
+def test_server_cache_timeout():
+    bindings = Cached()
+    server = RPCServer(bindings)
+    transport = Transport()
+    server.connection_made(transport)
+
+    # the timeouts sent along with the requests are not part of the key
+    params = [{"a": [1.5, "b"]}]
+    server.data_received(
+        msgpack.packb([REQUEST, 1, "lookup", params, 5.0])
+        + msgpack.packb([REQUEST, 2, "lookup", params, 4.9])
+        + msgpack.packb([REQUEST, 3, "lookup", params])
+    )
+
+    assert len(responses(transport)) == 3
+    assert bindings.calls == 1
+
+    stats = server.bindings.stats()["methods"]["lookup"]
+    assert stats["cache"]["hits"] == 2
+
+
+def test_server_cache_ttl():
+    bindings = Cached()
+    server = RPCServer(bindings)
+    transport = Transport()
+    server.connection_made(transport)
+
+    for i in range(3):
+        server.data_received(msgpack.packb([REQUEST, i, "expired", [1]]))
+
+    assert responses(transport) == [[RESPONSE, i, None, 1] for i in range(3)]
+    assert bindings.calls == 3
@@ -0,0 +1,60 @@
+import multiprocessing as mp
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from msgpackio.compat import Server
+from msgpackio.socket import RemoteException, SocketClient
+
+
+class Bindings:
+    def sum(self, x, y):
+        return x + y
+
+    def echo(self, value):
+        return value
+
+
+def test_socket_client_call_many():
+    server = Server(Bindings())
+    server.listen("127.0.0.1", 8890)
+    server.start()
+
+    try:
+        client = SocketClient("127.0.0.1", 8890)
+        client.connect(sleep_step=0.01)
+
+        assert client.call("sum", 1, 2) == 3
+
+        client.add_functions()
+        assert client.sum(1, 2) == 3
+
+        calls = [("sum", (i, 1)) for i in range(100)]
+        assert client.call_many(calls) == [i + 1 for i in range(100)]
+
+        calls = [("sum", (1, 1)), ("missing", ())]
+        results = client.call_many(calls, return_exceptions=True)
+        assert results[0] == 2
+        assert isinstance(results[1], RemoteException)
+    finally:
+        server.stop()
+
+
+def test_socket_client_unix_socket(tmp_path):
+    address = f"unix://{tmp_path}/server.sock"
+    server = Server(Bindings())
+    server.listen(address)
+    server.start()
+
+    try:
+        client = SocketClient(address)
+        client.connect(sleep_step=0.01)
+
+        assert client.call("sum", 1, 2) == 3
+
+        # requests and responses larger than the socket buffers
+        payload = b"x" * 2**20
+        assert client.call_many([("echo", (payload,))] * 8) == [payload] * 8
+    finally:
+        server.stop()
@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from msgpackio.aio import AsyncRPCClient
+from msgpackio.compat import Client, Server
+from msgpackio.exceptions import RemoteException
+
+
+class Bindings:
+    def __init__(self):
+        self.produced = 0
+        self.closed = False
+
+    def count(self, n):
+        for i in range(n):
+            yield i
+
+    async def acount(self, n):
+        for i in range(n):
+            await asyncio.sleep(0)
+            yield i
+
+    def fail(self, n):
+        for i in range(n):
+            yield i
+
+        raise ValueError("failed")
+
+    def tracked(self, n):
+        self.produced = 0
+        self.closed = False
+
+        try:
+            for i in range(n):
+                self.produced += 1
+                yield i
+        finally:
+            self.closed = True
+
+    def state(self):
+        return self.produced, self.closed
+
+    def sum(self, x, y):
+        return x + y
+
+
+@pytest.fixture
+def server():
+    server = Server(Bindings())
+    server.listen("127.0.0.1", 8895)
+    server.start()
+
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+def test_stream(server):
+    with Client("127.0.0.1", 8895) as client:
+        assert list(client.call_stream("count", 100)) == list(range(100))
+        assert list(client.call_stream("acount", 100, window=1)) == list(range(100))
+        assert list(client.call_stream("count", 0)) == []
+
+        # regular calls are interleaved with the chunks
+        stream = client.call_stream("count", 10)
+        assert client.call("sum", 1, 2) == 3
+        assert list(stream) == list(range(10))
+
+
+def test_stream_call(server):
+    # the items are collected unless a stream is requested
+    with Client("127.0.0.1", 8895) as client:
+        assert client.call("count", 3) == [0, 1, 2]
+        assert client.call_async("count", 100).get(timeout=3) == list(range(100))
+        assert client.call("acount", 20) == list(range(20))
+
+        with pytest.raises(RemoteException, match="failed"):
+            client.call("fail", 3)
+
+    async def main():
+        async with await AsyncRPCClient.connect("127.0.0.1", 8895) as client:
+            assert await client.call("acount", 100) == list(range(100))
+
+    asyncio.run(main())
+
+
+def test_stream_full_window(server):
+    with Client("127.0.0.1", 8895, max_in_flight=1) as client:
+        stream = client.call_stream("count", 100, window=2)
+
+        # waits for the stream to free the window
+        results = []
+        caller = threading.Thread(
+            target=lambda: results.append(client.call("sum", 1, 2))
+        )
+        caller.start()
+        time.sleep(0.1)
+
+        # granting credits does not wait behind the blocked caller
+        assert list(stream) == list(range(100))
+
+        caller.join(timeout=5)
+        assert results == [3]
+
+
+def test_stream_error(server):
+    with Client("127.0.0.1", 8895) as client:
+        items = []
+
+        with pytest.raises(RemoteException, match="failed"):
+            for item in client.call_stream("fail", 3):
+                items.append(item)
+
+        assert items == [0, 1, 2]
+
+
+def test_stream_flow_control(server):
+    with Client("127.0.0.1", 8895) as client:
+        with client.call_stream("tracked", 1000, window=4) as stream:
+            assert next(stream) == 0
+            time.sleep(0.1)
+
+            # the server does not run ahead of the credits granted
+            produced, closed = client.call("state")
+            assert produced <= 16 + 4 + 1
+            assert not closed
+
+        # closing the stream closes the generator on the server
+        for _ in range(100):
+            produced, closed = client.call("state")
+            if closed:
+                break
+            time.sleep(0.01)
+
+        assert closed
+        assert produced < 1000
+
+
+def test_async_stream(server):
+    async def main():
+        async with await AsyncRPCClient.connect("127.0.0.1", 8895) as client:
+            items = [item async for item in client.stream("acount", 50, window=2)]
+            assert items == list(range(50))
+
+            items = []
+            with pytest.raises(RemoteException, match="failed"):
+                async for item in client.stream("fail", 3):
+                    items.append(item)
+            assert items == [0, 1, 2]
+
+            async with client.stream("tracked", 1000, window=4) as stream:
+                assert await stream.__anext__() == 0
+
+            for _ in range(100):
+                produced, closed = await client.call("state")
+                if closed:
+                    break
+                await asyncio.sleep(0.01)
+
+            assert closed
+            assert produced < 1000
+
+    asyncio.run(main())
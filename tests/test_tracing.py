@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from msgpackio.aio import AsyncRPCClient
+from msgpackio.compat import Client, Server
+from msgpackio.tracing import PHASES, TraceAggregator, Tracer
+
+
+class Bindings:
+    def sum(self, x, y):
+        return x + y
+
+
+class Recorder(Tracer):
+    def __init__(self):
+        self.events = []
+
+    def on_phase(self, phase, msgid, start, end):
+        self.events.append((phase, msgid, start, end))
+
+
+@pytest.fixture
+def server():
+    server = Server(Bindings())
+    server.listen("127.0.0.1", 8894)
+    server.start()
+
+    try:
+        yield server
+    finally:
+        server.stop()
+
+
+def test_rpc_client_tracing(server):
+    tracer = TraceAggregator()
+
+    with Client("127.0.0.1", 8894, tracer=tracer) as client:
+        for i in range(10):
+            assert client.call("sum", i, 1) == i + 1
+
+        calls = [("sum", (i, 1)) for i in range(10)]
+        assert client.call_many(calls) == [i + 1 for i in range(10)]
+
+    summary = tracer.summary()
+    assert set(summary) == set(PHASES)
+
+    for phase in ("pack", "send", "unpack"):
+        assert summary[phase]["count"] == 20
+
+    # the wait is not traced if the response is handled before sent_at is set
+    assert 0 < summary["wait"]["count"] <= 20
+    # only the callers that blocked on their future wake up
+    assert 0 < summary["wakeup"]["count"] <= 20
+    assert summary["wait"]["p50"] > 0
+
+
+def test_rpc_client_phase_order(server):
+    tracer = Recorder()
+
+    with Client("127.0.0.1", 8894, tracer=tracer) as client:
+        assert client.call("sum", 1, 2) == 3
+
+    times = {phase: (start, end) for phase, _, start, end in tracer.events}
+    assert times["pack"][1] <= times["send"][0]
+    assert times["send"][1] <= times["unpack"][1]
+    assert times["unpack"][1] <= times["wakeup"][1]
+
+
+def test_socket_client_tracing(server):
+    pytest.importorskip("numpy")
+    from msgpackio.socket import SocketClient
+
+    tracer = TraceAggregator()
+    client = SocketClient("127.0.0.1", 8894, tracer=tracer)
+    client.connect(sleep_step=0.01)
+
+    assert client.call("sum", 1, 2) == 3
+    assert client.call_many([("sum", (1, 2))] * 5) == [3] * 5
+
+    summary = tracer.summary()
+    for phase in ("pack", "send", "wait", "unpack"):
+        assert summary[phase]["count"] == 6
+
+    assert summary["wakeup"]["count"] == 0
+
+
+def test_async_client_tracing(server):
+    tracer = TraceAggregator()
+
+    async def main():
+        async with await AsyncRPCClient.connect(
+            "127.0.0.1", 8894, tracer=tracer
+        ) as client:
+            results = await asyncio.gather(
+                *[client.call("sum", i, 1) for i in range(10)]
+            )
+            assert results == [i + 1 for i in range(10)]
+
+            # let the done callbacks run
+            await asyncio.sleep(0)
+
+    asyncio.run(main())
+
+    summary = tracer.summary()
+    for phase in PHASES:
+        assert summary[phase]["count"] == 10